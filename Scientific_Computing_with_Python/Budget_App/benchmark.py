@@ -0,0 +1,82 @@
+# Stress benchmark for concurrent transfers between budget categories. Run with:
+#
+#     python benchmark.py [--transfers 20000] [--output results.json]
+#
+# For each thread count, the threads perform random transfers between a shared pool of
+# categories. The run reports transfers/second and checks that no money was created or lost
+# and that no category was overdrawn. Results are emitted as JSON so that two runs can be
+# compared.
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+
+import budget
+
+THREAD_COUNTS = [1, 2, 4, 8]
+
+
+def stress(num_threads, num_categories, transfers, seed=0):
+    '''Returns the result record of one run with num_threads threads'''
+    categories = [budget.Category(f'Category {i}', exact=True) for i in range(num_categories)]
+    for category in categories:
+        category.deposit(1000, 'initial deposit')
+
+    per_thread = transfers // num_threads
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(i):
+        rng = random.Random(seed + i)
+        pairs = [rng.sample(categories, 2) for _ in range(per_thread)]
+        amounts = [rng.randint(1, 100) for _ in range(per_thread)]
+        barrier.wait()
+        for (source, destination), amount in zip(pairs, amounts):
+            source.transfer(amount, destination)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    balances = [category.get_balance() for category in categories]
+    return {'threads': num_threads,
+            'categories': num_categories,
+            'transfers': per_thread * num_threads,
+            'seconds': seconds,
+            'transfers_per_second': per_thread * num_threads / seconds,
+            'conserved': sum(balances) == 1000 * num_categories,
+            'overdrawn': sum(balance < 0 for balance in balances)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stress concurrent Category transfers.')
+    parser.add_argument('--transfers', type=int, default=20000, help='transfers per run')
+    parser.add_argument('--categories', type=int, default=16, help='categories shared by the threads')
+    parser.add_argument('--threads', type=int, action='append', help='thread count, may be repeated')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for num_threads in args.threads or THREAD_COUNTS:
+        record = stress(num_threads, args.categories, args.transfers)
+        print(f"threads={num_threads:<3} {record['transfers_per_second']:>12,.0f} transfers/s "
+              f"conserved={record['conserved']} overdrawn={record['overdrawn']}", file=sys.stderr)
+        results.append(record)
+
+    report = {'python': platform.python_version(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
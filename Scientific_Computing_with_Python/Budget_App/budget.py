@@ -1,13 +1,365 @@
+import bisect
+import csv
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import ExitStack
+from decimal import Decimal, ROUND_HALF_EVEN
+from functools import lru_cache
+from itertools import accumulate, count, islice
+from types import MappingProxyType
+
+
+def to_cents(amount):
+    '''Converts an amount (int, float, str or Decimal) to an exact integer number of cents'''
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_cents(cents):
+    '''Converts an integer number of cents to a Decimal amount with two decimal places'''
+    return Decimal(cents).scaleb(-2)
+
+
+# Statement line formats indexed by description length: the description (at most 23 
+# characters) followed by the amount right aligned to fill a line of 30 characters
+_LINE_FORMATS = ['{}{:>%d.2f}' % (30 - i) for i in range(24)]
+
+
+def _entry_lines(entries):
+    '''Helper function yielding the printed line of each ledger entry'''
+    for entry in entries:
+        # description limited to <=23 characters + amount right aligned to 30 characters
+        desc = entry['description'][:23]
+        yield _LINE_FORMATS[len(desc)].format(desc, entry['amount'])
+
+
+# Global lock order: categories are always locked in increasing creation order
+_lock_order = count()
+
+
+def locked(*categories):
+    '''
+    Args:
+        categories (Category): the categories to lock
+        
+    Returns:
+        (ExitStack): a context manager holding the lock of every given category
+        
+    Notes:
+        (1) Locks are always acquired in creation order of the categories, whatever the 
+            order they are passed in, so two threads locking overlapping sets of 
+            categories can never deadlock. A category passed twice is locked once.
+    '''
+    stack = ExitStack()
+    for category in sorted(set(categories), key=lambda c: c._order):
+        stack.enter_context(category._lock)
+    return stack
+
+
+class ColumnarLedger:
+    '''
+    A ledger that stores its entries column by column instead of as a list of dicts. It 
+    supports len(), indexing, slicing and iteration like the list ledger, and each entry 
+    is returned as a read-only {"amount": amount, "description": description} view.
+    
+    Notes:
+        (1) Amounts are packed into an array('d') buffer (8 bytes per entry). With 
+            exact=True they are stored as integer cents in an array('q') buffer instead and 
+            returned as Decimal.
+        
+        (2) Descriptions are interned into a string table: each distinct description is 
+            stored once and entries only keep its index in an array('L') column.
+            
+        (3) Aggregates run over the packed amounts without building any per-entry object.
+    '''
+    
+    def __init__(self, exact=False):
+        self.exact = exact
+        self.amounts = array('q' if exact else 'd')
+        self.description_ids = array('L')
+        self.strings = []
+        self._string_ids = {}
+        
+        
+    def add(self, amount, description=''):
+        '''Appends an entry to the ledger. With exact=True, amount is in integer cents.'''
+        idx = self._string_ids.get(description)
+        if idx is None:
+            idx = self._string_ids[description] = len(self.strings)
+            self.strings.append(description)
+        self.amounts.append(amount)
+        self.description_ids.append(idx)
+        
+        
+    def append(self, entry):
+        '''Appends an entry given as a {"amount": amount, "description": description} dict'''
+        amount = to_cents(entry['amount']) if self.exact else entry['amount']
+        self.add(amount, entry['description'])
+        
+        
+    def _value(self, amount):
+        '''Converts a stored amount to the value returned to callers'''
+        return from_cents(amount) if self.exact else amount
+        
+        
+    def total(self):
+        '''Returns the sum of all the amounts'''
+        return self._value(sum(self.amounts))
+    
+    
+    def spent(self):
+        '''Returns the sum of all the withdrawals, as a positive number'''
+        return self._value(-sum(amount for amount in self.amounts if amount < 0))
+    
+    
+    def __len__(self):
+        return len(self.amounts)
+    
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return MappingProxyType({"amount": self._value(self.amounts[i]), 
+                                 "description": self.strings[self.description_ids[i]]})
+    
+    
+    def __iter__(self):
+        strings = self.strings
+        for amount, idx in zip(self.amounts, self.description_ids):
+            yield MappingProxyType({"amount": self._value(amount), "description": strings[idx]})
+            
+
+class WalLedger:
+    '''
+    A durable ledger backed by an append-only binary write-ahead log. It has the same 
+    interface as ColumnarLedger, and reopening the same path restores every entry.
+    
+    Files:
+        path: one fixed-size record per entry (amount, description offset, description 
+              length), so entry i is found by offset without parsing the log.
+              
+        path.desc: the UTF-8 encoded descriptions, back to back.
+        
+        path.ckpt: the latest checkpoint (number of entries, total, spent).
+        
+    Notes:
+        (1) Each entry is written to the log and flushed before add returns (and fsynced 
+            with sync=True). A record torn by a crash is discarded on reopen. 
+            
+        (2) On open, both files are memory-mapped and entries are read from the maps on 
+            demand. The totals are restored from the checkpoint and only the records added 
+            after it are replayed, so startup time does not grow with the ledger history. 
+            A checkpoint is written every checkpoint_every entries. 
+            
+        (3) Amounts are stored as float64, or as int64 cents with exact=True. A log must 
+            always be reopened with the same exact setting.
+            
+        (4) Appends, reads and remapping are serialized by a lock, so entries can be read 
+            from one thread while another one appends (which replaces the maps).
+    '''
+    
+    def __init__(self, path, exact=False, checkpoint_every=10000, sync=False):
+        self.path = path
+        self.exact = exact
+        self.checkpoint_every = checkpoint_every
+        self.sync = sync
+        self._record = struct.Struct('<qQI' if exact else '<dQI')
+        self._checkpoint = struct.Struct('<Qqq' if exact else '<Qdd')
+        self._lock = threading.RLock()
+        
+        self._records = open(path, 'a+b')
+        self._descriptions = open(path + '.desc', 'a+b')
+        
+        # Drop a partially written trailing record
+        size = os.path.getsize(path)
+        if size % self._record.size:
+            self._records.truncate(size - size % self._record.size)
+        self._count = size // self._record.size
+        self._desc_size = os.path.getsize(path + '.desc')
+        self._records_map = self._descriptions_map = None
+        self._remap()
+        self._recover()
+        
+        
+    def _remap(self):
+        '''Memory-maps the current contents of the log files'''
+        self._close_maps()
+        if self._count:
+            self._records.flush()
+            self._descriptions.flush()
+            self._records_map = mmap.mmap(self._records.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._desc_size:
+                self._descriptions_map = mmap.mmap(self._descriptions.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped = self._count
+        
+        
+    def _close_maps(self):
+        for m in (self._records_map, self._descriptions_map):
+            if m is not None:
+                m.close()
+        self._records_map = self._descriptions_map = None
+        
+        
+    def _recover(self):
+        '''Restores the running totals from the checkpoint and the records that follow it'''
+        start, self.units_total, self.units_spent = 0, 0, 0
+        try:
+            with open(self.path + '.ckpt', 'rb') as f:
+                count, total, spent = self._checkpoint.unpack(f.read())
+            if count <= self._count:
+                start, self.units_total, self.units_spent = count, total, spent
+        except (FileNotFoundError, struct.error):
+            pass
+        
+        size = self._record.size
+        tail = self._records_map[start*size:self._count*size] if self._count else b''
+        for amount, _, _ in self._record.iter_unpack(tail):
+            self.units_total += amount
+            if amount < 0:
+                self.units_spent += -amount
+                
+                
+    def checkpoint(self):
+        '''Atomically writes the current totals to the checkpoint file'''
+        tmp = self.path + '.ckpt.tmp'
+        with self._lock, open(tmp, 'wb') as f:
+            f.write(self._checkpoint.pack(self._count, self.units_total, self.units_spent))
+            if self.sync:
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path + '.ckpt')
+        
+        
+    def add(self, amount, description=''):
+        '''Appends an entry to the log. With exact=True, amount is in integer cents.'''
+        data = description.encode('utf-8')
+        
+        with self._lock:
+            # The description is written first so that a record never points past the end of it
+            self._descriptions.write(data)
+            self._descriptions.flush()
+            self._records.write(self._record.pack(amount, self._desc_size, len(data)))
+            self._records.flush()
+            if self.sync:
+                os.fsync(self._descriptions.fileno())
+                os.fsync(self._records.fileno())
+                
+            self._desc_size += len(data)
+            self._count += 1
+            self.units_total += amount
+            if amount < 0:
+                self.units_spent += -amount
+            if self._count % self.checkpoint_every == 0:
+                self.checkpoint()
+            
+            
+    def append(self, entry):
+        '''Appends an entry given as a {"amount": amount, "description": description} dict'''
+        amount = to_cents(entry['amount']) if self.exact else entry['amount']
+        self.add(amount, entry['description'])
+        
+        
+    def _value(self, amount):
+        '''Converts a stored amount to the value returned to callers'''
+        return from_cents(amount) if self.exact else amount
+    
+    
+    def total(self):
+        '''Returns the sum of all the amounts'''
+        return self._value(self.units_total)
+    
+    
+    def spent(self):
+        '''Returns the sum of all the withdrawals, as a positive number'''
+        return self._value(self.units_spent)
+    
+    
+    def close(self):
+        '''Closes the log files'''
+        with self._lock:
+            self._close_maps()
+            self._records.close()
+            self._descriptions.close()
+        
+        
+    def __len__(self):
+        return self._count
+    
+    
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        with self._lock:
+            if i < 0:
+                i += self._count
+            if not 0 <= i < self._count:
+                raise IndexError('ledger index out of range')
+            if i >= self._mapped:
+                self._remap()
+                
+            amount, offset, length = self._record.unpack_from(self._records_map, i*self._record.size)
+            description = self._descriptions_map[offset:offset + length].decode('utf-8') if length else ''
+        return MappingProxyType({"amount": self._value(amount), "description": description})
+    
+    
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+            
+
 class Category:
     '''
     It should be able to instantiate objects based on different budget categories like food, 
     clothing, and entertainment. When objects are created, they are passed in the name of the 
     category. 
+    
+    Passing columnar=True stores the ledger in a ColumnarLedger instead of a list of dicts, 
+    which is much more compact for large ledgers.
+    
+    Passing exact=True keeps money as integer cents: amounts are rounded to the cent when 
+    they enter the ledger, the totals are exact integer sums and amounts are returned as 
+    Decimal (e.g. Decimal('834.33')), so printing the total never shows float artifacts.
+    
+    Passing path='food.wal' stores the ledger in a durable WalLedger at that path. Creating 
+    a category with the same path later restores its ledger and totals. sync=True fsyncs 
+    every entry before it is acknowledged, and checkpoint_every sets how many entries are 
+    written between two checkpoints of the totals (see WalLedger). 
+    
+    Categories are safe to use from several threads: each one has its own lock, withdrawals 
+    check and record under it, and transfers hold the locks of both categories (see locked). 
+    Statements can be printed while other threads record entries (a durable ledger 
+    serializes its own reads and writes).
+    
+    Deposits and withdrawals can carry an optional timestamp and tags. They are not part of 
+    the ledger entries but are indexed on the category (in memory only), so get_entries and 
+    get_total answer time-range and tag queries in O(log n + k) for k matching entries. The 
+    indexes are not stored in a durable ledger and are not rebuilt when it is reopened.
     '''
     
-    def __init__(self, n):
+    def __init__(self, n, columnar=False, exact=False, path=None, sync=False, checkpoint_every=10000):
         self.name = n
-        self.ledger = []
+        self.columnar = columnar
+        self.exact = exact
+        
+        # Running totals, updated on every ledger entry (in integer cents if exact)
+        self._balance = 0
+        self._spent = 0
+        
+        self._lock = threading.RLock()
+        self._order = next(_lock_order)
+        
+        # Sorted timestamps and the ledger index of each, of all the timestamped entries 
+        # (key None) and of those with each tag, and ledger indices by tag
+        self._stamps = {None: ([], [])}
+        self._tags = {}
+        
+        if path is not None:
+            self.ledger = WalLedger(path, exact, checkpoint_every, sync)
+            self._balance, self._spent = self.ledger.units_total, self.ledger.units_spent
+        else:
+            self.ledger = ColumnarLedger(exact) if columnar else []
    
 
     def get_balance(self):
@@ -18,8 +370,23 @@ class Category:
                      and withdrawals that have occurred
                      
         Notes:
+            (1) The balance is maintained as entries are added, so this is O(1). It is only
+                kept in sync with entries added through deposit, withdraw and transfer.
         '''
-        return sum(entry.get('amount', 0) for entry in self.ledger)
+        return from_cents(self._balance) if self.exact else self._balance
+    
+    
+    def get_spent(self):
+        '''
+        Args:      
+        Returns:
+            (float): the total amount withdrawn from the budget category, as a positive 
+                     number
+                     
+        Notes:
+            (1) Like the balance, the total is maintained as entries are added.
+        '''
+        return from_cents(self._spent) if self.exact else self._spent
     
     
     def __str__(self):
@@ -45,32 +412,118 @@ class Category:
             Transfer to Clothing    -50.00
             Total: 923.96
         '''   
-        output = [self.name.center(30, '*')]
-        for entry in self.ledger: 
-            amount, desc = entry['amount'], entry['description']
-            len_d = min(23,len(desc)) 
-            len_n = 30 - len_d
+        return '\n'.join(self.iter_lines())
+    
+    
+    def iter_lines(self, first=None, last=None):
+        '''
+        Args:
+            first (int or None): (optional) only show the first N ledger entries
+            
+            last (int or None): (optional) only show the last N ledger entries
+            
+        Yields:
+            (str): the lines of the printed category, one at a time
+            
+        Notes:
+            (1) Without first and last, the lines are exactly those of str(category), but 
+                no list of lines is built, so very large ledgers can be streamed. 
+                
+            (2) With first and/or last, only that page of entries is shown and a "..." 
+                line stands for the entries left out. 
+                
+        Example:
+            >> print('\n'.join(food.iter_lines(first=1, last=1)))
+            *************Food*************
+            initial deposit        1000.00
+            ...
+            Transfer to Clothing    -50.00
+            Total: 923.96
+        '''
+        yield self.name.center(30, '*')
+        
+        if first is None and last is None:
+            yield from _entry_lines(self.ledger)
+        else:
+            size = len(self.ledger)
+            head = min(first or 0, size)
+            tail = max(head, size - (last or 0))
+            yield from _entry_lines(self.ledger[i] for i in range(head))
+            if tail > head:
+                yield '...'
+            yield from _entry_lines(self.ledger[i] for i in range(tail, size))
             
-            # description limited to <=23 characters + amount limited to 7> characters. Zero padded in middle 
-            line = desc[:len_d] + ('{:>'+f'{max(7,len_n)}'+'.2f}').format(amount)
-            output.append(line)
+        yield f'Total: {self.get_balance()}'
+        
+        
+    def write_to(self, fileobj, chunk_size=1000, first=None, last=None):
+        '''
+        Args:
+            fileobj (file): a text file, or any object with a write method
             
-        output.append(f'Total: {self.get_balance()}')
-        return '\n'.join(output)
+            chunk_size (int): the number of lines written at a time
+            
+            first, last: the same page of entries as iter_lines
+            
+        Notes:
+            (1) Writes the same text as str(category) (or iter_lines' page), chunk by chunk.
+        '''
+        lines = self.iter_lines(first, last)
+        sep = ''
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                break
+            fileobj.write(sep + '\n'.join(chunk))
+            sep = '\n'
 
         
-    def deposit(self, amount, description=''):
+    def deposit(self, amount, description='', timestamp=None, tags=()):
         '''
         Args:
             amount (float): the amount being deposited
             
             description (str): description of deposit
+            
+            timestamp (datetime or None): (optional) when the deposit happened. Any values 
+                                          that compare with each other can be used.
+            
+            tags (iterable[str]): (optional) labels to query the deposit by
         
         Notes:
             The method should append an object to the ledger list in the form of 
             {"amount": amount, "description": description}.
         '''
-        self.ledger.append({"amount": amount, "description": description})
+        self._record(to_cents(amount) if self.exact else amount, description, timestamp, tags)
+    
+    
+    def _record(self, units, description, timestamp=None, tags=()):
+        '''Appends an entry whose amount is already in ledger units and updates the totals'''
+        with self._lock:
+            # The totals and indexes are only updated once the entry is recorded, so that 
+            # an invalid amount or a failed write leaves them untouched
+            balance = self._balance + units
+            spent = self._spent - units if units < 0 else self._spent
+            row = len(self.ledger)
+            if isinstance(self.ledger, list):
+                value = from_cents(units) if self.exact else units
+                self.ledger.append({"amount": value, "description": description})
+            else:
+                self.ledger.add(units, description)
+            self._balance, self._spent = balance, spent
+                
+            tags = tuple(tags)
+            for tag in tags:
+                self._tags.setdefault(tag, []).append(row)
+            if timestamp is not None:
+                for key in (None,) + tags:
+                    stamps, rows = self._stamps.setdefault(key, ([], []))
+                    # Entries usually arrive in time order, which makes this an append
+                    i = len(stamps)
+                    if i and timestamp < stamps[-1]:
+                        i = bisect.bisect_right(stamps, timestamp)
+                    stamps.insert(i, timestamp)
+                    rows.insert(i, row)
     
     
     def check_funds(self, amount):
@@ -85,25 +538,34 @@ class Category:
         Notes:
             (1) This method should be used by both the withdraw method and transfer method.
         '''
+        if self.exact:
+            return self._balance >= to_cents(amount)
         return True if self.get_balance() >= amount else False
     
         
-    def withdraw(self, amount, description=''):
+    def withdraw(self, amount, description='', timestamp=None, tags=()):
         '''
         Args:
             amount (float): amount being withdrawn to be stored in the ledger as a negative number.
                         
             description (str): description of withdrawal
+            
+            timestamp (datetime or None): (optional) when the withdrawal happened
+            
+            tags (iterable[str]): (optional) labels to query the withdrawal by
         
         Returns:
             (bool): return True if the withdrawal took place, and False otherwise
         
         Notes:
             (1) If there are not enough funds, nothing should be added to the ledger. 
+            
+            (2) The check and the withdrawal happen atomically under the category's lock.
         '''
-        outcome = self.check_funds(amount)
-        if outcome == True:
-            self.deposit(-amount, description)
+        with self._lock:
+            outcome = self.check_funds(amount)
+            if outcome == True:
+                self.deposit(-amount, description, timestamp, tags)
         return outcome
     
         
@@ -126,13 +588,261 @@ class Category:
                 the description "Transfer from [Source Budget Category]". 
                 
             (3) If there are not enough funds, nothing should be added to either ledgers. 
+            
+            (4) The transfer is atomic: both categories stay locked from the funds check 
+                until both entries are recorded, so concurrent transfers can neither 
+                overdraw a category nor be seen half done.
         '''
-        outcome = self.check_funds(amount)
-        if outcome == True:
-            self.deposit(-amount, f"Transfer to {category.name}") 
-            category.deposit(amount, f"Transfer from {self.name}")
+        with locked(self, category):
+            outcome = self.check_funds(amount)
+            if outcome == True:
+                self.deposit(-amount, f"Transfer to {category.name}") 
+                category.deposit(amount, f"Transfer from {self.name}")
         return outcome
     
+    
+    def _rows(self, start, end, tag):
+        '''Helper function returning the ledger indices matched by a query, in ledger order'''
+        if start is None and end is None:
+            return list(self._tags.get(tag, ())) if tag is not None else range(len(self.ledger))
+        
+        # The timestamp index of all the entries, or of the tagged ones
+        stamps, rows = self._stamps.get(tag, ((), ()))
+        lo = 0 if start is None else bisect.bisect_left(stamps, start)
+        hi = len(stamps) if end is None else bisect.bisect_left(stamps, end)
+        return sorted(rows[lo:hi])
+    
+    
+    def get_entries(self, start=None, end=None, tag=None):
+        '''
+        Args:
+            start (datetime or None): (optional) only entries at or after this time
+            
+            end (datetime or None): (optional) only entries strictly before this time
+            
+            tag (str or None): (optional) only entries with this tag
+        
+        Returns:
+            (list): the matching ledger entries, in ledger order
+            
+        Notes:
+            (1) A time range only matches entries that were given a timestamp. Time ranges 
+                are found by binary search in a sorted timestamp index, kept for all the 
+                entries and for each tag, and tags are looked up in an inverted index, so 
+                the cost is O(log n + k). Entries recorded out of time order are sorted back 
+                into ledger order, in O(k log k) at worst. 
+                
+        Example:
+            >> food.get_entries(datetime(2024, 5, 1), datetime(2024, 6, 1), tag='groceries')
+            [{'amount': -10.15, 'description': 'groceries'}, ...]
+        '''
+        with self._lock:
+            return [self.ledger[row] for row in self._rows(start, end, tag)]
+        
+        
+    def get_total(self, start=None, end=None, tag=None, spent=False):
+        '''
+        Args:
+            start, end, tag: the same query as get_entries
+            
+            spent (bool): sum only the withdrawals, as a positive number
+        
+        Returns:
+            (float): the sum of the amounts of the matching entries
+            
+        Example:
+            >> food.get_total(datetime(2024, 5, 1), datetime(2024, 6, 1), 'groceries', spent=True)
+            10.15
+        '''
+        amounts = [entry['amount'] for entry in self.get_entries(start, end, tag)]
+        if spent:
+            return -sum(amount for amount in amounts if amount < 0)
+        return sum(amounts)
+    
+    
+    def close(self):
+        '''Closes the files of a durable ledger. Other ledgers need no closing.'''
+        if isinstance(self.ledger, WalLedger):
+            self.ledger.close()
+            
+            
+    def dump(self, path, chunk_size=10000):
+        '''
+        Args:
+            path (str): the CSV file to write
+            
+            chunk_size (int): the number of ledger rows written at a time
+        
+        Notes:
+            (1) Writes one "amount,description" row per ledger entry, after a header row. 
+                Rows are formatted and written chunk by chunk, so no copy of the whole 
+                ledger is built.
+        '''
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['amount', 'description'])
+            entries = iter(self.ledger)
+            while True:
+                chunk = [(entry['amount'], entry['description']) for entry in islice(entries, chunk_size)]
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                
+                
+    def _read_units(self, path, chunk_size):
+        '''Helper generator yielding the (units, description) rows of a CSV file in chunks'''
+        parse = to_cents if self.exact else float
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            while True:
+                chunk = [(parse(amount), description) for amount, description in islice(reader, chunk_size)]
+                if not chunk:
+                    break
+                yield chunk
+                
+                
+    def load(self, path, chunk_size=10000):
+        '''
+        Args:
+            path (str): a CSV file in the format written by dump
+            
+            chunk_size (int): the number of ledger rows read at a time
+        
+        Returns:
+            (int): the number of entries added to the ledger
+        
+        Notes:
+            (1) The file is loaded as a single batch: either every row is added or none is. 
+            
+            (2) Instead of checking funds row by row, the file is first streamed once to 
+                compute the running balance as a prefix sum over each chunk. If the balance 
+                goes below zero after a withdrawal (a negative amount), a ValueError naming 
+                that row is raised and the ledger is left untouched. 
+                
+            (3) The rows are then streamed again and appended without further checks. The 
+                category stays locked for the whole load.
+        '''
+        with self._lock:
+            balance, row = self._balance, 0
+            for chunk in self._read_units(path, chunk_size):
+                amounts = [units for units, _ in chunk]
+                # Balance after each row of the chunk
+                prefix = list(accumulate(amounts, initial=balance))[1:]
+                for i, units in enumerate(amounts):
+                    if units < 0 and prefix[i] < 0:
+                        raise ValueError(f'Insufficient funds at row {row + i} of {path}; nothing was loaded.')
+                balance = prefix[-1]
+                row += len(chunk)
+            
+            for chunk in self._read_units(path, chunk_size):
+                for units, description in chunk:
+                    self._record(units, description)
+            return row
+    
+
+class Budget:
+    '''
+    A registry of budget categories by name that can apply a whole batch of deposits, 
+    withdrawals and transfers in one call. For example:
+    
+    budget = Budget(Category("Food"), Category("Clothing"))
+    budget.apply([("deposit", "Food", 1000, "initial deposit"),
+                  ("withdraw", "Food", 10.15, "groceries"),
+                  ("transfer", "Food", 50, "Clothing"),
+                  ("withdraw", "Clothing", 100)])
+    [True, True, True, False]
+    '''
+    
+    def __init__(self, *categories):
+        self.categories = {c.name: c for c in categories}
+        
+        
+    def add(self, name, **kwargs):
+        '''Returns the category with this name, creating it with the given options if needed'''
+        if name not in self.categories:
+            self.categories[name] = Category(name, **kwargs)
+        return self.categories[name]
+    
+    
+    def __getitem__(self, name):
+        return self.categories[name]
+    
+    
+    def __iter__(self):
+        return iter(self.categories.values())
+    
+    
+    def __len__(self):
+        return len(self.categories)
+    
+    
+    def apply(self, transactions):
+        '''
+        Args:
+            transactions (iterable[tuple]): the transactions to apply, in order, each one of
+            
+                ("deposit", name, amount[, description])
+                ("withdraw", name, amount[, description])
+                ("transfer", source name, amount, destination name)
+                
+        Returns:
+            (list[bool]): whether each transaction took place
+            
+        Notes:
+            (1) Each transaction succeeds or fails exactly as the matching Category method 
+                would if called in the same order. 
+                
+            (2) Instead of a method call and a funds check per transaction, the batch is 
+                checked in one pass against a running balance per category, and the 
+                accepted entries are then recorded category by category. 
+                
+            (3) Every category involved is locked for the whole batch (see locked), so the 
+                batch is applied atomically with respect to other threads.
+        '''
+        transactions = list(transactions)
+        names = {t[1] for t in transactions} | {t[3] for t in transactions if t[0] == 'transfer'}
+        categories = {name: self.categories[name] for name in names}
+        
+        results = []
+        with locked(*categories.values()):
+            balances = {name: c._balance for name, c in categories.items()}
+            pending = {name: [] for name in categories}
+            
+            def units(name, amount):
+                return to_cents(amount) if categories[name].exact else amount
+            
+            for kind, name, amount, *rest in transactions:
+                if kind == 'deposit':
+                    entries = [(name, units(name, amount), rest[0] if rest else '')]
+                elif kind == 'withdraw':
+                    entries = [(name, -units(name, amount), rest[0] if rest else '')]
+                elif kind == 'transfer':
+                    entries = [(name, -units(name, amount), f"Transfer to {rest[0]}"), 
+                               (rest[0], units(rest[0], amount), f"Transfer from {name}")]
+                else:
+                    raise ValueError(f'Unknown transaction type {kind!r}.')
+                    
+                # Withdrawals and transfers need enough funds in the first category
+                ok = kind == 'deposit' or balances[name] >= -entries[0][1]
+                if ok:
+                    for entry_name, entry_units, description in entries:
+                        balances[entry_name] += entry_units
+                        pending[entry_name].append((entry_units, description))
+                results.append(ok)
+                
+            for name, entries in pending.items():
+                record = categories[name]._record
+                for entry_units, description in entries:
+                    record(entry_units, description)
+        return results
+    
+    
+    def spend_chart(self):
+        '''Returns create_spend_chart() of every category, in the order they were added'''
+        return create_spend_chart(list(self.categories.values()))
+    
+    
 def labels(names):
     '''Helper function
     Args:
@@ -167,10 +877,20 @@ def labels(names):
     return '\n'.join(tmp)    
 
 
+@lru_cache(maxsize=64)
+def _cached_labels(names):
+    '''Memoized labels(), keyed on the tuple of category names'''
+    return labels(names)
+
+
 def makeCircles(categories):
-    ''''''
-    spent = [sum(-1*entry.get('amount', 0) for entry in c.ledger if entry.get('amount', 0) < 0) for c in categories]
-    percentage = [(spent[i] / sum(spent))*100 // 10 * 10 for i in range(len(categories))]
+    '''
+    Notes:
+        (1) Uses the spent total each category maintains, so no ledger is rescanned. 
+    '''
+    spent = [float(c.get_spent()) for c in categories]
+    total = sum(spent)
+    percentage = [s / total * 100 // 10 * 10 for s in spent]
     
     circles = []
     # For each percentage bin: 100, 90, ..., 0
@@ -210,6 +930,10 @@ def create_spend_chart(categories):
         (7) Each category name should be vertacally below the bar. 
         
         (8) There should be a title at the top that says "Percentage spent by category".
+        
+        (9) The chart is cheap to refresh after every transaction: the spent totals are 
+            maintained by each category and the label block is cached for a given list 
+            of category names.
     
     Example:
         >> create_spend_chart([food, clothing, auto])
@@ -243,4 +967,4 @@ def create_spend_chart(categories):
     
     chart = '\n'.join([str(i).rjust(3) + '|' + circles[idx] for idx, i in enumerate(range(100,-1,-10))]) + '\n'
            
-    return title + chart + divider + labels(names)
\ No newline at end of file
+    return title + chart + divider + _cached_labels(tuple(names))
\ No newline at end of file
@@ -1,3 +1,9 @@
+import datetime
+import io
+import os
+import random
+import tempfile
+import threading
 import unittest
 import budget
 from budget import create_spend_chart
@@ -93,5 +99,223 @@ class UnitTests(unittest.TestCase):
         expected = "Percentage spent by category\n100|          \n 90|          \n 80|          \n 70|    o     \n 60|    o     \n 50|    o     \n 40|    o     \n 30|    o     \n 20|    o  o  \n 10|    o  o  \n  0| o  o  o  \n    ----------\n     B  F  E  \n     u  o  n  \n     s  o  t  \n     i  d  e  \n     n     r  \n     e     t  \n     s     a  \n     s     i  \n           n  \n           m  \n           e  \n           n  \n           t  "
         self.assertEqual(actual, expected, 'Expected different chart representation. Check that all spacing is exact.')
 
+    def test_running_totals(self):
+        self.food.deposit(900, "deposit")
+        self.food.withdraw(45.67, "milk, cereal, eggs, bacon, bread")
+        self.food.transfer(20, self.entertainment)
+        self.food.withdraw(10000)
+        actual = self.food.get_balance()
+        expected = sum(entry["amount"] for entry in self.food.ledger)
+        self.assertEqual(actual, expected, 'Expected running balance to match the ledger.')
+        actual = self.food.get_spent()
+        expected = 65.67
+        self.assertAlmostEqual(actual, expected, msg = 'Expected spent total to include withdrawals and transfers out.')
+        self.assertEqual(self.entertainment.get_spent(), 0, 'Expected a transfer in not to count as spending.')
+
+    def test_columnar_ledger(self):
+        food = budget.Category("Food", columnar=True)
+        food.deposit(900, "deposit")
+        food.withdraw(45.67, "milk, cereal, eggs, bacon, bread")
+        food.transfer(20, self.entertainment)
+        food.withdraw(10.5, "deposit")
+        actual = food.ledger[1]
+        expected = {"amount": -45.67, "description": "milk, cereal, eggs, bacon, bread"}
+        self.assertEqual(actual, expected, 'Expected columnar ledger to return the same entries.')
+        self.assertEqual(len(food.ledger.strings), 3, 'Expected columnar ledger to store each description once.')
+        self.assertEqual(food.get_balance(), food.ledger.total(), 'Expected columnar ledger total to match the balance.')
+        self.assertEqual(food.get_spent(), food.ledger.spent(), 'Expected columnar ledger spent to match the spent total.')
+        expected = f"*************Food*************\ndeposit                 900.00\nmilk, cereal, eggs, bac -45.67\nTransfer to Entertainme -20.00\ndeposit                 -10.50\nTotal: 823.83"
+        self.assertEqual(str(food), expected, 'Expected columnar ledger to print the same statement.')
+        with self.assertRaises(TypeError):
+            food.ledger[0]["amount"] = 0
+
+    def test_exact_cents(self):
+        for columnar in (False, True):
+            food = budget.Category("Food", columnar=columnar, exact=True)
+            for i in range(10):
+                food.deposit(0.1, "deposit")
+            food.withdraw(0.3, "groceries")
+            self.assertEqual(food.get_balance(), budget.Decimal("0.70"), 'Expected exact balance to have no float drift.')
+            self.assertEqual(food.get_spent(), budget.Decimal("0.30"), 'Expected exact spent total to have no float drift.')
+            self.assertEqual(food.ledger[10], {"amount": budget.Decimal("-0.30"), "description": "groceries"}, 'Expected exact amounts in the ledger.')
+            self.assertTrue(str(food).endswith("groceries                -0.30\nTotal: 0.70"), 'Expected exact total to print with two decimals.')
+            self.assertEqual(food.check_funds(0.7), True, 'Expected `check_funds` to compare exact amounts.')
+            self.assertEqual(food.withdraw(0.71), False, 'Expected `withdraw` to reject an overdraft by a cent.')
+
+    def test_dump_and_load(self):
+        self.food.deposit(900, "deposit")
+        self.food.withdraw(45.67, "milk, cereal, eggs, bacon, bread")
+        self.food.transfer(20, self.entertainment)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "food.csv")
+            self.food.dump(path, chunk_size=2)
+            for exact in (False, True):
+                copy = budget.Category("Food", exact=exact)
+                actual = copy.load(path, chunk_size=2)
+                self.assertEqual(actual, 3, 'Expected `load` to return the number of rows added.')
+                self.assertEqual(str(copy), str(self.food), 'Expected a loaded ledger to match the dumped one.')
+
+            with open(path, "a") as f:
+                f.write("-900,too much\n100,late deposit\n")
+            copy = budget.Category("Food")
+            with self.assertRaisesRegex(ValueError, "row 3"):
+                copy.load(path, chunk_size=2)
+            self.assertEqual(copy.ledger, [], 'Expected an overdraft to reject the whole batch.')
+
+    def test_durable_ledger(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "food.wal")
+            food = budget.Category("Food", path=path, sync=True, checkpoint_every=2)
+            food.deposit(900, "deposit")
+            food.withdraw(45.67, "milk, cereal, eggs, bacon, bread")
+            food.transfer(20, self.entertainment)
+            food.withdraw(10000)
+            expected = str(food)
+            self.assertTrue(food.ledger.sync, 'Expected sync to be passed on to the durable ledger.')
+            self.assertTrue(os.path.exists(path + ".ckpt"), 'Expected a checkpoint after checkpoint_every entries.')
+            food.close()
+
+            food = budget.Category("Food", path=path)
+            self.assertEqual(str(food), expected, 'Expected a reopened ledger to restore every entry.')
+            self.assertEqual(food.get_balance(), 834.33, 'Expected a reopened ledger to restore the balance.')
+            self.assertEqual(food.ledger[-1], {"amount": -20, "description": "Transfer to Entertainment"}, 'Expected durable entries to be indexable.')
+            food.deposit(10, "\u00e9pargne")
+            food.close()
+
+            with open(path, "ab") as f:
+                f.write(b"torn")
+            food = budget.Category("Food", path=path)
+            self.assertEqual(len(food.ledger), 4, 'Expected a torn record to be discarded.')
+            self.assertEqual(food.ledger[3]["description"], "\u00e9pargne", 'Expected descriptions to round-trip.')
+            self.assertAlmostEqual(food.get_spent(), 65.67, msg = 'Expected a reopened ledger to restore the spent total.')
+            food.close()
+
+    def test_concurrent_transfers(self):
+        categories = [budget.Category(name) for name in ("Food", "Entertainment", "Business", "Auto")]
+        for category in categories:
+            category.deposit(100, "deposit")
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for i in range(2000):
+                source, destination = rng.sample(categories, 2)
+                source.transfer(rng.randint(1, 60), destination)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(c.get_balance() for c in categories), 400, 'Expected concurrent transfers to conserve the total balance.')
+        for category in categories:
+            self.assertGreaterEqual(category.get_balance(), 0, 'Expected concurrent transfers never to overdraw a category.')
+            self.assertEqual(category.get_balance(), sum(entry["amount"] for entry in category.ledger), 'Expected both sides of every transfer to be recorded.')
+
+    def test_concurrent_durable_reads(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            food = budget.Category("Food", path=os.path.join(tmp, "food.wal"))
+            errors = []
+
+            def writer():
+                for i in range(3000):
+                    food.deposit(1, "deposit")
+
+            def reader():
+                try:
+                    while writer_thread.is_alive():
+                        str(food)
+                except Exception as e:
+                    errors.append(e)
+
+            writer_thread = threading.Thread(target=writer)
+            readers = [threading.Thread(target=reader) for i in range(2)]
+            writer_thread.start()
+            for thread in readers:
+                thread.start()
+            writer_thread.join()
+            for thread in readers:
+                thread.join()
+            food.close()
+
+            self.assertEqual(errors, [], 'Expected statements to be printable while entries are recorded.')
+            self.assertEqual(food.get_balance(), 3000, 'Expected every concurrent deposit to be recorded.')
+
+    def test_create_spend_chart_refresh(self):
+        self.food.deposit(900, "deposit")
+        self.entertainment.deposit(900, "deposit")
+        self.food.withdraw(105.55)
+        first = create_spend_chart([self.food, self.entertainment])
+        self.entertainment.withdraw(300)
+        second = create_spend_chart([self.food, self.entertainment])
+        self.assertNotEqual(first, second, 'Expected the chart to reflect new withdrawals.')
+        self.assertTrue(second.startswith("Percentage spent by category\n100|       \n 90|       \n 80|       \n 70|    o  \n"), 'Expected the chart to use the updated spent totals.')
+        self.assertEqual(first.split("-------\n")[1], budget.labels(["Food", "Entertainment"]), 'Expected the cached labels to match labels().')
+
+    def test_time_and_tag_queries(self):
+        day = lambda d: datetime.datetime(2024, 5, d)
+        self.food.deposit(900, "deposit", timestamp=day(1))
+        self.food.withdraw(45.67, "milk, cereal, eggs, bacon, bread", timestamp=day(3), tags=["groceries"])
+        self.food.withdraw(20, "restaurant", timestamp=day(2), tags=["eating out"])
+        self.food.withdraw(10.15, "groceries", timestamp=day(20), tags=["groceries"])
+        self.food.withdraw(5, "snack", tags=["groceries"])
+        actual = self.food.get_entries(day(2), day(10))
+        expected = [{"amount": -45.67, "description": "milk, cereal, eggs, bacon, bread"}, {"amount": -20, "description": "restaurant"}]
+        self.assertEqual(actual, expected, 'Expected a time range to return the entries inside it, in ledger order.')
+        self.assertAlmostEqual(self.food.get_total(tag="groceries", spent=True), 60.82, msg = 'Expected a tag query to include entries without a timestamp.')
+        self.assertAlmostEqual(self.food.get_total(day(1), day(10), tag="groceries"), -45.67, msg = 'Expected a tag and time range query to match both.')
+        self.food.withdraw(3, "bread", timestamp=day(2), tags=["groceries"])
+        actual = [entry["description"] for entry in self.food.get_entries(day(2), day(21), tag="groceries")]
+        self.assertEqual(actual, ["milk, cereal, eggs, bacon, bread", "groceries", "bread"], 'Expected a tag and time range query to return the entries in ledger order.')
+        self.assertEqual(self.food.get_total(end=day(1)), 0, 'Expected an empty range to sum to zero.')
+        self.assertEqual(self.food.get_total(tag="unknown", spent=True), 0, 'Expected an unknown tag to sum to zero.')
+        self.assertEqual(self.food.ledger[1], {"amount": -45.67, "description": "milk, cereal, eggs, bacon, bread"}, 'Expected timestamps and tags to stay out of the ledger entries.')
+
+    def test_failed_entry_is_not_indexed(self):
+        food = budget.Category("Food", columnar=True)
+        with self.assertRaises(TypeError):
+            food.deposit("12", tags=["groceries"], timestamp=datetime.datetime(2024, 5, 1))
+        food.deposit(5, "good")
+        self.assertEqual(food.get_entries(tag="groceries"), [], 'Expected a failed entry to leave no tag index behind.')
+        self.assertEqual(food.get_entries(start=datetime.datetime(2024, 1, 1)), [], 'Expected a failed entry to leave no timestamp index behind.')
+        self.assertEqual(food.get_balance(), 5, 'Expected a failed entry to leave the balance unchanged.')
+
+    def test_streamed_statement(self):
+        self.food.deposit(900, "deposit")
+        self.food.withdraw(45.67, "milk, cereal, eggs, bacon, bread")
+        self.food.transfer(20, self.entertainment)
+        self.food.deposit(12345.678, "bonus")
+        buffer = io.StringIO()
+        self.food.write_to(buffer, chunk_size=2)
+        self.assertEqual(buffer.getvalue(), str(self.food), 'Expected the streamed statement to match the printed one.')
+        self.assertEqual(list(self.food.iter_lines()), str(self.food).split("\n"), 'Expected iter_lines to yield the printed lines.')
+        self.assertEqual(str(self.food).split("\n")[4], "bonus                 12345.68", 'Expected long amounts to keep the original alignment.')
+        actual = list(self.food.iter_lines(first=1, last=1))
+        expected = ["*************Food*************", "deposit                 900.00", "...", "bonus                 12345.68", "Total: 13180.008"]
+        self.assertEqual(actual, expected, 'Expected a paginated statement to elide the middle entries.')
+        actual = list(self.food.iter_lines(first=3, last=3))[1:-1]
+        self.assertEqual(actual, str(self.food).split("\n")[1:-1], 'Expected overlapping pages to show every entry once.')
+
+    def test_budget_batch(self):
+        registry = budget.Budget(self.food, self.entertainment)
+        registry.add("Business", exact=True)
+        actual = registry.apply([
+            ("deposit", "Food", 900, "deposit"),
+            ("withdraw", "Food", 45.67, "milk, cereal, eggs, bacon, bread"),
+            ("transfer", "Food", 20, "Entertainment"),
+            ("withdraw", "Entertainment", 25),
+            ("transfer", "Food", 10.99, "Business"),
+            ("withdraw", "Business", 10.99, "supplies"),
+        ])
+        self.assertEqual(actual, [True, True, True, False, True, True], 'Expected one success flag per transaction.')
+        expected = f"*************Food*************\ndeposit                 900.00\nmilk, cereal, eggs, bac -45.67\nTransfer to Entertainme -20.00\nTransfer to Business    -10.99\nTotal: 823.34"
+        self.assertEqual(str(self.food), expected, 'Expected a batch to record the same entries as method calls.')
+        self.assertEqual(self.entertainment.ledger, [{"amount": 20, "description": "Transfer from Food"}], 'Expected a failed withdrawal to record nothing.')
+        self.assertEqual(registry["Business"].get_balance(), 0, 'Expected a batch to update the balances in order.')
+        self.assertEqual(len(registry), 3, 'Expected the budget to register every category by name.')
+        self.assertEqual(registry.spend_chart(), create_spend_chart([self.food, self.entertainment, registry["Business"]]), 'Expected the budget chart to cover every category.')
+        with self.assertRaises(ValueError):
+            registry.apply([("refund", "Food", 1)])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
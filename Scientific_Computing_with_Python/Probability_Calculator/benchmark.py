@@ -0,0 +1,130 @@
+# Benchmarks for the hot paths of prob_calculator. Run with:
+#
+#     python benchmark.py [--quick] [--output results.json]
+#
+# Every case is timed (best of --repeat runs) and then run once more under tracemalloc to
+# record its peak memory. Results are emitted as JSON so that two runs can be compared.
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import prob_calculator
+from prob_calculator import CompactHat, Hat
+
+COLORS = ['red', 'blue', 'green', 'yellow']
+EXPECTED = {'red': 1, 'blue': 1}
+
+HAT_SIZES = [10, 1000, 10**5, 10**6]
+DRAW_SIZES = [5, 50]
+EXPERIMENT_COUNTS = [100, 10000]
+
+# Cases whose work (experiments * hat size for the batch engine, experiments * draw size
+# otherwise) exceeds this bound are skipped to keep a full run within a few minutes.
+MAX_WORK = 10**8
+
+
+def make_hat(size, cls=Hat):
+    '''Returns a hat of the given size with the balls split evenly between COLORS'''
+    return cls(**{color: size // len(COLORS) + (i < size % len(COLORS)) for i, color in enumerate(COLORS)})
+
+
+def bench_draw(size, n, experiments, cls=Hat):
+    # A fresh hat is built for every draw, outside of the timed region
+    hats = [make_hat(size, cls) for i in range(min(experiments, 10))]
+    start = time.perf_counter()
+    for hat in hats:
+        hat.draw(n)
+    return time.perf_counter() - start, len(hats)
+
+
+def bench_sample(size, n, experiments):
+    hat = make_hat(size)
+    start = time.perf_counter()
+    for i in range(experiments):
+        hat.sample(n)
+    return time.perf_counter() - start, experiments
+
+
+def bench_experiment(size, n, experiments):
+    hat = make_hat(size)
+    start = time.perf_counter()
+    prob_calculator.experiment(hat, EXPECTED, n, experiments)
+    return time.perf_counter() - start, experiments
+
+
+def bench_experiment_batch(size, n, experiments):
+    hat = make_hat(size)
+    start = time.perf_counter()
+    prob_calculator.experiment_batch(hat, EXPECTED, n, experiments, seed=0)
+    return time.perf_counter() - start, experiments
+
+
+BENCHMARKS = {
+    'Hat.draw': (bench_draw, lambda size, n, e: min(e, 10) * size),
+    'CompactHat.draw': (lambda size, n, e: bench_draw(size, n, e, CompactHat), lambda size, n, e: e * n),
+    'Hat.sample': (bench_sample, lambda size, n, e: e * n * n),
+    'experiment': (bench_experiment, lambda size, n, e: e * n * n),
+    'experiment_batch': (bench_experiment_batch, lambda size, n, e: e * size),
+}
+
+
+def run_case(name, size, n, experiments, repeat):
+    '''Returns the result record of one benchmark case'''
+    func, _ = BENCHMARKS[name]
+    best, trials = min(func(size, n, experiments) for i in range(repeat))
+
+    tracemalloc.start()
+    func(size, n, experiments)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'benchmark': name,
+            'hat_size': size,
+            'num_balls_drawn': n,
+            'num_experiments': experiments,
+            'seconds': best,
+            'trials_per_second': trials / best if best else float('inf'),
+            'peak_memory_bytes': peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the prob_calculator hot paths.')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest cases')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS),
+                        help='benchmark to run, may be repeated (default: all)')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    sizes = HAT_SIZES[:2] if args.quick else HAT_SIZES
+    counts = EXPERIMENT_COUNTS[:1] if args.quick else EXPERIMENT_COUNTS
+
+    results = []
+    for name in args.benchmark or BENCHMARKS:
+        _, work = BENCHMARKS[name]
+        for size in sizes:
+            for n in DRAW_SIZES:
+                for experiments in counts:
+                    if work(size, n, experiments) > MAX_WORK:
+                        continue
+                    record = run_case(name, size, n, experiments, args.repeat)
+                    print(f"{name:>18} size={size:<8} n={n:<3} experiments={experiments:<6} "
+                          f"{record['trials_per_second']:>14,.0f} trials/s "
+                          f"{record['peak_memory_bytes'] / 2**20:>8.2f} MiB", file=sys.stderr)
+                    results.append(record)
+
+    report = {'python': platform.python_version(),
+              'numpy': prob_calculator.np.__version__,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,22 @@
-import copy
+import math
+import os
 import random
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from statistics import NormalDist
+
+import numpy as np
+
+# Upper bound on the number of random sort keys generated per vectorized batch
+_BATCH_CELLS = 2**22
+
+# Largest number of count combinations enumerated before falling back to simulation
+_MAX_STATES = 10**6
+
+# Largest sampling weight given to an expected color by the importance sampler
+_MAX_TILT = 1e6
 
 class Hat:
     '''
@@ -31,6 +47,7 @@ class Hat:
         self.contents = [[key]*arg for key,arg in kwargs.items()]
         self.contents = [j for color in self.contents for j in color]
         self.balls = []
+        self._positions = None
     
     def draw(self, n):
         '''
@@ -55,12 +72,259 @@ class Hat:
         
         self.balls = [self.contents.pop(random.randint(0, len(self.contents)-1)) for i in range(n)]
         return self.balls
-            
-        
+
+    def sample(self, n):
+        '''
+        Args:
+            n (int): indicates the number of balls to draw from the hat
+
+        Returns:
+            (list): n balls drawn at random without replacement
+
+        Notes:
+            (1) Unlike draw, the hat is left unchanged. Each ball is picked exactly as draw
+                picks it (a random rank among the remaining balls), but the rank is mapped
+                back to an index of contents with a Fenwick tree over the positions that
+                are still in the hat, in O(log size). The drawn positions are put back
+                afterwards, so the tree is only built once per hat size and nothing
+                proportional to the size of the hat is copied.
+
+            (2) For small hats, or when a large share of the hat is drawn, copying contents
+                and popping from the copy (as draw does) is cheaper in CPython, and that is
+                used instead.
+
+            (3) With the same random state, sample(n) returns the same balls as draw(n).
+
+            (4) If the number of balls to draw exceeds the available quantity, return
+                all the balls.
+        '''
+        contents = self.contents
+        size = len(contents)
+        if n > size:
+            return list(contents)
+        if n == 0:
+            return []
+
+        # Estimated costs, in tree steps: n descents of the tree, against one copy of
+        # contents plus n pops that each move part of it
+        if n * size.bit_length() > size // 100 + n * (2 + size // 4000):
+            remaining = list(contents)
+            return [remaining.pop(random.randint(0, size-1-i)) for i in range(n)]
+
+        # Fenwick tree over the positions of contents, 1-indexed, counting the balls left
+        tree = self._positions
+        if tree is None or len(tree) != size + 1:
+            tree = self._positions = [i & -i for i in range(size + 1)]
+
+        top = 1 << (size.bit_length() - 1)
+        taken = []
+        for i in range(n):
+            # Descend the tree to the position of the r-th remaining ball
+            r = random.randint(0, size-1-i)
+            pos, step = 0, top
+            while step:
+                nxt = pos + step
+                if nxt <= size and tree[nxt] <= r:
+                    pos = nxt
+                    r -= tree[nxt]
+                step >>= 1
+            taken.append(pos)
+            pos += 1
+            while pos <= size:
+                tree[pos] -= 1
+                pos += pos & -pos
+
+        # Put the drawn positions back
+        for pos in taken:
+            pos += 1
+            while pos <= size:
+                tree[pos] += 1
+                pos += pos & -pos
+        return [contents[pos] for pos in taken]
+
+    def stream(self, replace=False):
+        '''
+        Args:
+            replace (bool): whether each ball goes back into the hat after it is drawn
+
+        Yields:
+            (str): the color of each ball drawn, one at a time
+
+        Notes:
+            (1) Without replacement, each yielded ball is removed from contents (in O(1),
+                by swapping it with the last ball) and the stream ends once the hat is
+                empty. With replacement the stream never ends.
+
+            (2) Balls are only drawn as they are consumed, so a long stream runs in
+                constant memory, e.g. itertools.islice(hat.stream(True), 10**8).
+        '''
+        contents = self.contents
+        while contents:
+            idx = random.randrange(len(contents))
+            if replace:
+                yield contents[idx]
+            else:
+                contents[idx], contents[-1] = contents[-1], contents[idx]
+                yield contents.pop()
+
+    def draw_counts(self, n, replace=False):
+        '''
+        Args:
+            n (int): indicates the number of balls to draw from the hat
+
+            replace (bool): whether each ball goes back into the hat after it is drawn
+
+        Returns:
+            (dict): the number of balls drawn of each color
+
+        Notes:
+            (1) Like draw, but only the per-color tallies are returned and no list of
+                drawn balls is built. Without replacement the balls are removed from the
+                hat, and asking for more balls than it holds tallies all of them.
+        '''
+        return Counter(islice(self.stream(replace), n))
+
+    def _counts(self):
+        '''Returns a dict mapping each color in the hat to its number of balls'''
+        return Counter(self.contents)
+
+
+class CompactHat(Hat):
+    '''
+    A Hat that stores one count per color instead of one string per ball, so its size
+    only depends on the number of colors. It is created the same way as a Hat:
+
+    hat = CompactHat(yellow=3000000, blue=2000000, green=6)
+
+    Notes:
+        (1) Remaining counts are kept in a Fenwick (binary indexed) tree, so drawing a
+            ball weighted by the remaining counts costs O(log k) for k colors instead of
+            popping from the middle of a list.
+
+        (2) contents is materialized on access as a list of strings, for compatibility
+            with Hat. Prefer counts for large hats.
+    '''
+
+    def __init__(self, **kwargs):
+        if len(kwargs) == 0:
+            raise TypeError('A hat must always have at least 1 ball. Cannot be empty.')
+        self.colors = list(kwargs)
+        self.counts = [kwargs[color] for color in self.colors]
+        self.total = sum(self.counts)
+        self.balls = []
+
+        # Fenwick tree over counts, 1-indexed
+        self._tree = [0] + self.counts
+        for i in range(1, len(self._tree)):
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+
+    @property
+    def contents(self):
+        return [color for color, count in zip(self.colors, self.counts) for _ in range(count)]
+
+    def _counts(self):
+        return {color: count for color, count in zip(self.colors, self.counts) if count}
+
+    def _update(self, pos, delta):
+        '''Adds delta to the count of the color at index pos'''
+        self.counts[pos] += delta
+        self.total += delta
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, r):
+        '''Returns the color index of the r-th remaining ball (0-indexed)'''
+        # Descend the tree to the first color whose cumulative count exceeds r
+        pos, step = 0, 1 << (len(self.counts).bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= r:
+                pos = nxt
+                r -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+    def _take(self, r):
+        '''Removes the r-th remaining ball (0-indexed) and returns its color index'''
+        pos = self._find(r)
+        self._update(pos, -1)
+        return pos
+
+    def draw(self, n):
+        '''
+        Args:
+            n (int): indicates the number of balls to draw from the hat
+
+        Returns:
+            balls (list):
+
+        Notes:
+            (1) Same behavior as Hat.draw: balls are removed at random without replacement
+                and drawing more balls than the hat holds returns all the balls.
+        '''
+        if n > self.total:
+            return self.contents + self.balls
+
+        self.balls = [self.colors[self._take(random.randrange(self.total))] for i in range(n)]
+        return self.balls
+
+    def sample(self, n):
+        '''
+        Args:
+            n (int): indicates the number of balls to draw from the hat
+
+        Returns:
+            (list): n balls drawn at random without replacement
+
+        Notes:
+            (1) Same behavior as Hat.sample: the hat is left unchanged. The drawn balls are
+                put back into the tree afterwards in O(n log k).
+        '''
+        if n > self.total:
+            return self.contents
+
+        taken = [self._take(random.randrange(self.total)) for i in range(n)]
+        for pos in taken:
+            self._update(pos, 1)
+        return [self.colors[pos] for pos in taken]
+
+    def stream(self, replace=False):
+        '''Same behavior as Hat.stream, drawing each ball in O(log k)'''
+        while self.total:
+            r = random.randrange(self.total)
+            yield self.colors[self._find(r) if replace else self._take(r)]
+
+    def draw_counts(self, n, replace=False):
+        '''
+        Same behavior as Hat.draw_counts.
+
+        Notes:
+            (1) The tallies are drawn in bulk with NumPy's multivariate hypergeometric
+                (without replacement) or multinomial (with replacement) sampler, in O(k)
+                whatever n is. The generator is seeded from the random module so that
+                random.seed still makes draws reproducible.
+        '''
+        if self.total == 0:
+            return Counter()
+        rng = np.random.default_rng(random.getrandbits(64))
+        if replace:
+            drawn = rng.multinomial(n, np.array(self.counts) / self.total)
+        else:
+            drawn = rng.multivariate_hypergeometric(self.counts, min(n, self.total))
+            for pos, count in enumerate(drawn):
+                if count:
+                    self._update(pos, -int(count))
+        return Counter({color: int(count) for color, count in zip(self.colors, drawn) if count})
+
+
 def experiment(hat, expected_balls, num_balls_drawn, num_experiments):
     '''
     Args:
-        hat (Hat): A hat object containing balls that should be copied inside the function.
+        hat (Hat): A hat object containing balls. It is left unchanged.
         
         expected_balls (list): An object indicating the exact group of balls to attempt to 
                                draw from the hat for the experiment.
@@ -81,11 +345,8 @@ def experiment(hat, expected_balls, num_balls_drawn, num_experiments):
     '''
     event = []
     for i in range(num_experiments):
-        # Work with a fresh copy of the Hat
-        tmp_hat = copy.deepcopy(hat)
-        
-        # A list of the drawn balls
-        drawn = tmp_hat.draw(num_balls_drawn)
+        # A list of the drawn balls. sample() restores the hat, so no copy is needed
+        drawn = hat.sample(num_balls_drawn)
         
         # A dictionary of the frequencies
         freq = Counter(drawn)
@@ -95,4 +356,514 @@ def experiment(hat, expected_balls, num_balls_drawn, num_experiments):
         # Did the experiment succeed?
         event.append(True if sum(result) == len(expected_balls) else False)
         
-    return sum(event) / num_experiments
\ No newline at end of file
+    return sum(event) / num_experiments
+
+
+def _encode(hat):
+    '''Helper function
+    Args:
+        hat (Hat): the hat to encode
+
+    Returns:
+        colors (list): the distinct color names in order of first appearance
+
+        codes (np.ndarray): one integer color index per ball in the hat
+
+    Example:
+        >> _encode(Hat(red=2, blue=1))
+        (['red', 'blue'], array([0, 0, 1]))
+    '''
+    freq = hat._counts()
+    colors = list(freq)
+    codes = np.repeat(np.arange(len(colors)), [freq[c] for c in colors])
+    return colors, codes
+
+
+def _tally(codes, num_colors, num_balls_drawn, num_trials, rng):
+    '''Helper function
+    Args:
+        codes (np.ndarray): integer color index of every ball in the hat
+
+        num_colors (int): the number of distinct colors
+
+        num_balls_drawn (int): the number of balls drawn in each trial
+
+        num_trials (int): the number of independent trials to simulate
+
+        rng (np.random.Generator): the source of randomness
+
+    Returns:
+        (np.ndarray): a (num_trials, num_colors) matrix of drawn color counts
+
+    Notes:
+        (1) Each trial ranks the balls by an independent uniform key and keeps the
+            num_balls_drawn smallest, i.e. a uniformly random draw without replacement.
+
+        (2) Trials are processed in row chunks so that no more than _BATCH_CELLS keys
+            are held in memory at once.
+    '''
+    total = len(codes)
+    counts = np.zeros((num_trials, num_colors), dtype=np.int64)
+    if num_balls_drawn >= total:
+        # Every ball is drawn in every trial
+        counts[:] = np.bincount(codes, minlength=num_colors)
+        return counts
+    if num_balls_drawn <= 0:
+        return counts
+
+    rows = max(1, _BATCH_CELLS // total)
+    for lo in range(0, num_trials, rows):
+        hi = min(lo + rows, num_trials)
+        keys = rng.random((hi - lo, total))
+        picked = np.argpartition(keys, num_balls_drawn - 1, axis=1)[:, :num_balls_drawn]
+
+        # Offset each row's color indices so a single bincount tallies every trial
+        offsets = np.arange(hi - lo)[:, None] * num_colors
+        flat = (codes[picked] + offsets).ravel()
+        counts[lo:hi] = np.bincount(flat, minlength=(hi - lo)*num_colors).reshape(hi - lo, num_colors)
+    return counts
+
+
+def _successes(counts, colors, expected_balls):
+    '''Helper function
+    Args:
+        counts (np.ndarray): a (num_trials, num_colors) matrix of drawn color counts
+
+        colors (list): the color name of each column of counts
+
+        expected_balls (dict): the minimum number of balls of each color
+
+    Returns:
+        (np.ndarray): a boolean vector marking the trials that drew the expected balls
+    '''
+    success = np.ones(len(counts), dtype=bool)
+    for color, needed in expected_balls.items():
+        if color in colors:
+            success &= counts[:, colors.index(color)] >= needed
+        elif needed > 0:
+            success[:] = False
+    return success
+
+
+def experiment_batch(hat, expected_balls, num_balls_drawn, num_experiments, seed=None):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat in each experiment.
+
+        num_experiments (int): The number of experiments to perform.
+
+        seed (int or None): (optional) a seed for the random generator so that results
+                            are reproducible
+
+    Returns:
+        (float): the estimated probability of obtaining the expected balls
+
+    Notes:
+        (1) This is a vectorized drop-in for experiment(). The hat is encoded as an array of
+            integer color indices and every experiment is drawn at once with NumPy: each row
+            ranks the balls by random keys and the drawn colors are tallied with bincount.
+
+        (2) The same seed always produces the same estimate.
+
+    Example:
+        >> hat = Hat(blue=3, red=2, green=6)
+        >> experiment_batch(hat, {"blue":2, "green":1}, 4, 1000000, seed=95)
+        0.263...
+    '''
+    colors, codes = _encode(hat)
+    rng = np.random.default_rng(seed)
+    counts = _tally(codes, len(colors), num_balls_drawn, num_experiments, rng)
+    return int(_successes(counts, colors, expected_balls).sum()) / num_experiments
+
+
+@lru_cache(maxsize=2**16)
+def _log_comb(n, k):
+    '''Memoized natural logarithm of the binomial coefficient (n choose k), -inf when it is 0'''
+    if k < 0 or k > n:
+        return -math.inf
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+def _num_states(hat_counts, expected_balls, num_balls_drawn):
+    '''Helper function
+    Returns:
+        (int): an upper bound on the number of count combinations exact_probability()
+               enumerates for the given query
+    '''
+    states = 1
+    for color, needed in expected_balls.items():
+        available = min(hat_counts.get(color, 0), num_balls_drawn)
+        states *= max(0, available - needed + 1)
+    return states
+
+
+def exact_probability(hat, expected_balls, num_balls_drawn):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat.
+
+    Returns:
+        (float): the exact probability of obtaining the expected balls
+
+    Notes:
+        (1) The probability is the multivariate hypergeometric sum over every admissible
+            number of balls drawn of each expected color. Colors that are not in
+            expected_balls are lumped together into a single "other" bucket, so the cost
+            only depends on the colors being asked about.
+
+        (2) Each term is computed from the logarithms of its binomial coefficients
+            (math.lgamma) relative to the total number of draws, so it costs the same
+            whatever the size of the hat. Exact integer coefficients have O(n log N)
+            digits, which made large hats (tens of thousands of balls) take seconds per
+            query. The relative error grows with the size of the hat but stays well below
+            1e-6 for hats of a million balls.
+
+        (3) As with Hat.draw, drawing more balls than the hat holds draws all of them.
+
+    Example:
+        >> hat = Hat(blue=3, red=2, green=6)
+        >> exact_probability(hat, {"blue":2, "green":1}, 4)
+        0.2636363636363636
+    '''
+    hat_counts = hat._counts()
+    total = sum(hat_counts.values())
+    n = min(num_balls_drawn, total)
+
+    targets = [(hat_counts.get(color, 0), needed) for color, needed in expected_balls.items()]
+    others = total - sum(available for available, _ in targets)
+
+    log_draws = _log_comb(total, n)
+
+    def ways(i, remaining, log_ways):
+        # Probability of the draws of `remaining` balls from the targets i.. and the other
+        # bucket, given log_ways ways of drawing the targets before i
+        if i == len(targets):
+            return math.exp(log_ways + _log_comb(others, remaining) - log_draws)
+        available, needed = targets[i]
+        return sum(ways(i + 1, remaining - x, log_ways + _log_comb(available, x))
+                   for x in range(max(needed, 0), min(available, remaining) + 1))
+
+    return ways(0, n, 0.0)
+
+
+def probability(hat, expected_balls, num_balls_drawn, num_experiments=10**6, seed=None,
+                max_states=_MAX_STATES):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat.
+
+        num_experiments (int): The number of experiments to simulate when the exact sum
+                               is not tractable.
+
+        seed (int or None): (optional) a seed for the simulation fallback
+
+        max_states (int): the largest number of count combinations to enumerate exactly
+
+    Returns:
+        (float): the exact probability when it is tractable, otherwise an estimate from
+                 experiment_batch()
+    '''
+    hat_counts = hat._counts()
+    if _num_states(hat_counts, expected_balls, num_balls_drawn) <= max_states:
+        return exact_probability(hat, expected_balls, num_balls_drawn)
+    return experiment_batch(hat, expected_balls, num_balls_drawn, num_experiments, seed=seed)
+
+
+def _count_successes(codes, colors, expected_balls, num_balls_drawn, num_trials, seed_seq):
+    '''Helper function run inside each worker process of experiment_parallel()
+
+    Returns:
+        (int): the number of successful trials in this shard
+    '''
+    rng = np.random.default_rng(seed_seq)
+    counts = _tally(codes, len(colors), num_balls_drawn, num_trials, rng)
+    return int(_successes(counts, colors, expected_balls).sum())
+
+
+def experiment_parallel(hat, expected_balls, num_balls_drawn, num_experiments, seed=None,
+                        workers=None):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat in each experiment.
+
+        num_experiments (int): The number of experiments to perform.
+
+        seed (int or None): (optional) a seed for the random generators
+
+        workers (int or None): the number of worker processes. Defaults to os.cpu_count().
+
+    Returns:
+        (float): the estimated probability of obtaining the expected balls
+
+    Notes:
+        (1) num_experiments is split into one shard per worker and the shards run in a
+            ProcessPoolExecutor. Each shard draws from its own generator spawned from
+            np.random.SeedSequence(seed), so the streams are statistically independent.
+
+        (2) The result only depends on seed and workers: the same pair always produces
+            the same estimate, whatever order the shards finish in.
+    '''
+    workers = workers or os.cpu_count() or 1
+    colors, codes = _encode(hat)
+
+    base, extra = divmod(num_experiments, workers)
+    shards = [base + (i < extra) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_count_successes, codes, colors, expected_balls,
+                               num_balls_drawn, trials, seed_seq)
+                   for trials, seed_seq in zip(shards, seeds) if trials > 0]
+        successes = sum(f.result() for f in futures)
+    return successes / num_experiments
+
+
+def _wilson(successes, trials, z):
+    '''Returns the (lower, upper) Wilson score interval for a binomial proportion'''
+    p = successes / trials
+    denom = 1 + z**2 / trials
+    center = (p + z**2 / (2*trials)) / denom
+    half = z * math.sqrt(p*(1 - p)/trials + z**2 / (4*trials**2)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def experiment_adaptive(hat, expected_balls, num_balls_drawn, tolerance=0.005, confidence=0.95,
+                        batch_size=10000, max_experiments=10**8, seed=None):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat in each experiment.
+
+        tolerance (float): the target half-width of the confidence interval
+
+        confidence (float): the confidence level of the interval, e.g. 0.95
+
+        batch_size (int): the number of experiments simulated between two checks
+
+        max_experiments (int): a hard cap on the number of experiments performed
+
+        seed (int or None): (optional) a seed for the random generator
+
+    Returns:
+        (dict): the estimate and how it was obtained
+
+            {
+              'probability': estimated probability,
+              'interval': (lower, upper) Wilson score interval,
+              'num_experiments': number of experiments actually performed
+            }
+
+    Notes:
+        (1) Instead of guessing num_experiments up front, experiments are run in batches
+            with experiment_batch()'s engine and the Wilson score interval is updated after
+            each batch. Sampling stops as soon as its half-width is below tolerance, or
+            once max_experiments have been performed.
+
+        (2) batch_size and max_experiments must be positive, otherwise a ValueError is
+            raised.
+    '''
+    if batch_size <= 0:
+        raise ValueError(f'batch_size must be positive, got {batch_size}')
+    if max_experiments <= 0:
+        raise ValueError(f'max_experiments must be positive, got {max_experiments}')
+
+    colors, codes = _encode(hat)
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf(0.5 + confidence/2)
+
+    successes, trials = 0, 0
+    while trials < max_experiments:
+        size = min(batch_size, max_experiments - trials)
+        counts = _tally(codes, len(colors), num_balls_drawn, size, rng)
+        successes += int(_successes(counts, colors, expected_balls).sum())
+        trials += size
+
+        lower, upper = _wilson(successes, trials, z)
+        if (upper - lower) / 2 <= tolerance:
+            break
+
+    return {'probability': successes / trials,
+            'interval': (lower, upper),
+            'num_experiments': trials}
+
+
+def experiment_many(hat, expected_balls_list, num_balls_drawn, num_experiments, seed=None):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls_list (list[dict]): the groups of balls to score, each in the same
+                                          form as experiment()'s expected_balls
+
+        num_balls_drawn (int): The number of balls to draw out of the hat in each experiment.
+
+        num_experiments (int): The number of experiments to perform.
+
+        seed (int or None): (optional) a seed for the random generator
+
+    Returns:
+        (list[float]): the estimated probability of each group, in the order given
+
+    Notes:
+        (1) The draws are simulated once and every group is scored against the same
+            per-experiment color-count matrix, so N queries cost one simulation.
+
+        (2) Because they share draws, the estimates are correlated with each other. Each
+            one on its own matches experiment_batch() with the same seed.
+
+    Example:
+        >> hat = Hat(blue=3, red=2, green=6)
+        >> experiment_many(hat, [{"blue":2}, {"blue":2, "green":1}], 4, 100000, seed=95)
+        [0.3..., 0.26...]
+    '''
+    colors, codes = _encode(hat)
+    rng = np.random.default_rng(seed)
+    counts = _tally(codes, len(colors), num_balls_drawn, num_experiments, rng)
+    return [int(_successes(counts, colors, expected_balls).sum()) / num_experiments
+            for expected_balls in expected_balls_list]
+
+
+def _tilt(hat_counts, expected_balls, num_balls_drawn):
+    '''Helper function
+    Returns:
+        (dict): a sampling weight for each expected color so that, under the biased draw,
+                about as many balls of each color are drawn as are expected
+
+    Notes:
+        (1) With weights w, a ball of color c is drawn with probability proportional to
+            w[c] * count[c]. Unexpected colors keep a weight of 1. Weights are never below 1,
+            i.e. draws are only ever biased towards the expected colors.
+    '''
+    targets = {c: e for c, e in expected_balls.items() if e > 0 and hat_counts.get(c, 0) > 0}
+    expected_total = sum(targets.values())
+    rest = sum(hat_counts.values()) - sum(hat_counts[c] for c in targets)
+    if expected_total >= num_balls_drawn or rest == 0:
+        return {c: _MAX_TILT for c in targets}
+
+    # Total weight of the hat when the expected colors make up expected_total/num_balls_drawn of it
+    scale = rest / (1 - expected_total/num_balls_drawn)
+    return {c: min(_MAX_TILT, max(1.0, e*scale / (num_balls_drawn*hat_counts[c])))
+            for c, e in targets.items()}
+
+
+def _weighted_draws(initial, w, num_balls_drawn, num_trials, rng):
+    '''Helper function
+    Args:
+        initial (np.ndarray): the number of balls of each color in the hat
+
+        w (np.ndarray): the sampling weight of each color
+
+        num_balls_drawn (int): the number of balls drawn in each trial
+
+        num_trials (int): the number of independent trials to simulate
+
+        rng (np.random.Generator): the source of randomness
+
+    Returns:
+        counts (np.ndarray): a (num_trials, num_colors) matrix of drawn color counts
+
+        log_ratio (np.ndarray): the log likelihood ratio of each trial's draws
+    '''
+    total = int(initial.sum())
+    remaining = np.tile(initial, (num_trials, 1))
+    log_ratio = np.zeros(num_trials)
+    trials = np.arange(num_trials)
+    for step in range(min(num_balls_drawn, total)):
+        weighted = remaining * w
+        weight_total = weighted.sum(axis=1)
+        u = rng.random(num_trials) * weight_total
+        picked = (np.cumsum(weighted, axis=1) > u[:, None]).argmax(axis=1)
+
+        # Fair probability count[c]/(total-step) over biased probability w[c]*count[c]/W
+        log_ratio += np.log(weight_total / ((total - step) * w[picked]))
+        remaining[trials, picked] -= 1
+    return initial - remaining, log_ratio
+
+
+def experiment_importance(hat, expected_balls, num_balls_drawn, num_experiments, weights=None,
+                          seed=None):
+    '''
+    Args:
+        hat (Hat): A hat object containing balls. It is left unchanged.
+
+        expected_balls (dict): An object indicating the exact group of balls to attempt to
+                               draw from the hat for the experiment.
+
+        num_balls_drawn (int): The number of balls to draw out of the hat in each experiment.
+
+        num_experiments (int): The number of experiments to perform.
+
+        weights (dict or None): (optional) the sampling weight of each color. When None,
+                                weights biased towards expected_balls are chosen
+                                automatically. Colors missing from a supplied dict get a
+                                weight of 1, so {} reduces to a plain simulation.
+
+        seed (int or None): (optional) a seed for the random generator
+
+    Returns:
+        (dict): the estimate and its accuracy
+
+            {
+              'probability': estimated probability,
+              'std_error': standard error of the estimate,
+              'num_experiments': number of experiments performed
+            }
+
+    Notes:
+        (1) Meant for rare outcomes, where experiment() would need billions of experiments
+            before seeing a single success. Balls are drawn one at a time with probability
+            proportional to weight * remaining count, so the expected colors come up far
+            more often, and each successful experiment is reweighted by its likelihood
+            ratio (the product over draws of its probability under the fair draw divided
+            by its probability under the biased one). The estimate stays unbiased.
+
+        (2) All experiments are drawn together with NumPy, one ball per step.
+
+    Example:
+        >> hat = Hat(red=1000, blue=5, green=5)
+        >> experiment_importance(hat, {"blue":3, "green":3}, 10, 10000, seed=95)
+        {'probability': 1.40...e-11, 'std_error': 4.0...e-13, 'num_experiments': 10000}
+    '''
+    hat_counts = hat._counts()
+    colors = list(hat_counts)
+    if weights is None:
+        weights = _tilt(hat_counts, expected_balls, num_balls_drawn)
+    w = np.array([weights.get(c, 1.0) for c in colors], dtype=float)
+
+    rng = np.random.default_rng(seed)
+    initial = np.array([hat_counts[c] for c in colors], dtype=float)
+
+    values = []
+    rows = max(1, _BATCH_CELLS // len(colors))
+    for lo in range(0, num_experiments, rows):
+        counts, log_ratio = _weighted_draws(initial, w, num_balls_drawn, min(rows, num_experiments - lo), rng)
+        values.append(_successes(counts, colors, expected_balls) * np.exp(log_ratio))
+    values = np.concatenate(values)
+
+    return {'probability': float(values.mean()),
+            'std_error': float(values.std(ddof=1) / math.sqrt(num_experiments)) if num_experiments > 1 else float('nan'),
+            'num_experiments': num_experiments}
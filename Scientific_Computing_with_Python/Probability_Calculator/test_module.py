@@ -1,3 +1,5 @@
+import copy
+import math
 import unittest
 import prob_calculator
 
@@ -30,5 +32,160 @@ class UnitTests(unittest.TestCase):
         expected = 1.0
         self.assertAlmostEqual(actual, expected, delta = 0.01, msg = 'Expected experiment method to return a different probability.')
 
+class EngineTests(unittest.TestCase):
+    def setUp(self):
+        # Keep the seeded stream used by UnitTests intact regardless of test order
+        self.state = prob_calculator.random.getstate()
+
+    def tearDown(self):
+        prob_calculator.random.setstate(self.state)
+
+    def test_experiment_batch(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        probability = prob_calculator.experiment_batch(hat=hat, expected_balls={"blue":2,"green":1}, num_balls_drawn=4, num_experiments=200000, seed=95)
+        self.assertAlmostEqual(probability, 0.263, delta = 0.005, msg = 'Expected batch experiment to return a different probability.')
+        self.assertEqual(len(hat.contents), 11, 'Expected batch experiment to leave the hat unchanged.')
+        hat = prob_calculator.Hat(yellow=5,red=1,green=3,blue=9,test=1)
+        probability = prob_calculator.experiment_batch(hat=hat, expected_balls={"yellow":2,"blue":3,"test":1}, num_balls_drawn=20, num_experiments=100)
+        self.assertEqual(probability, 1.0, 'Expected drawing every ball to always succeed.')
+
+    def test_experiment_batch_seed(self):
+        hat = prob_calculator.Hat(blue=4,red=2,green=6)
+        kwargs = dict(hat=hat, expected_balls={"blue":2,"red":1}, num_balls_drawn=4, num_experiments=5000, seed=7)
+        actual = prob_calculator.experiment_batch(**kwargs)
+        expected = prob_calculator.experiment_batch(**kwargs)
+        self.assertEqual(actual, expected, 'Expected the same seed to reproduce the same estimate.')
+
+    def test_exact_probability(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        actual = prob_calculator.exact_probability(hat, {"blue":2,"green":1}, 4)
+        self.assertAlmostEqual(actual, 29/110, msg = 'Expected exact probability to equal the hypergeometric sum.')
+        actual = prob_calculator.exact_probability(hat, {"blue":2,"purple":1}, 4)
+        self.assertEqual(actual, 0.0, 'Expected a color missing from the hat to be impossible to draw.')
+        hat = prob_calculator.Hat(yellow=5,red=1,green=3,blue=9,test=1)
+        actual = prob_calculator.exact_probability(hat, {"yellow":2,"blue":3,"test":1}, 20)
+        self.assertEqual(actual, 1.0, 'Expected drawing every ball to always succeed.')
+        # P(X >= 250) for a hypergeometric X symmetric around 250 is 1/2 + P(X = 250)/2
+        hat = prob_calculator.CompactHat(red=25000,blue=25000)
+        actual = prob_calculator.exact_probability(hat, {"red":250}, 500)
+        expected = 0.5 + math.comb(25000, 250)**2 / math.comb(50000, 500) / 2
+        self.assertAlmostEqual(actual, expected, places = 9, msg = 'Expected exact probability to stay accurate for a large hat.')
+
+    def test_probability_fallback(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        exact = prob_calculator.probability(hat, {"blue":2,"green":1}, 4)
+        self.assertAlmostEqual(exact, 29/110, msg = 'Expected a tractable query to be solved exactly.')
+        estimate = prob_calculator.probability(hat, {"blue":2,"green":1}, 4, num_experiments=200000, seed=1, max_states=0)
+        self.assertNotEqual(estimate, exact, 'Expected an intractable query to be simulated.')
+        self.assertAlmostEqual(estimate, exact, delta = 0.005, msg = 'Expected the simulated fallback to approximate the exact answer.')
+
+    def test_experiment_parallel(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        kwargs = dict(hat=hat, expected_balls={"blue":2,"green":1}, num_balls_drawn=4, num_experiments=100000, seed=95, workers=2)
+        actual = prob_calculator.experiment_parallel(**kwargs)
+        self.assertAlmostEqual(actual, 29/110, delta = 0.01, msg = 'Expected parallel experiment to return a different probability.')
+        expected = prob_calculator.experiment_parallel(**kwargs)
+        self.assertEqual(actual, expected, 'Expected the same seed and worker count to reproduce the same estimate.')
+
+    def test_compact_hat(self):
+        hat = prob_calculator.CompactHat(red=3,blue=2)
+        self.assertEqual(hat.contents, ["red","red","red","blue","blue"], 'Expected compact hat to materialize the same contents as a hat.')
+        prob_calculator.random.seed(3)
+        drawn = hat.draw(4)
+        self.assertEqual(len(drawn), 4, 'Expected compact hat draw to return four balls.')
+        self.assertEqual(sorted(drawn + hat.contents), ["blue","blue","red","red","red"], 'Expected compact hat draw to remove the drawn balls.')
+        self.assertEqual(hat.total, 1, 'Expected compact hat draw to reduce the remaining count.')
+        self.assertEqual(hat.draw(5), hat.contents + drawn, 'Expected drawing too many balls to return all the balls.')
+
+    def test_compact_hat_engines(self):
+        hat = prob_calculator.CompactHat(blue=3,red=2,green=6,black=0)
+        actual = prob_calculator.exact_probability(hat, {"blue":2,"green":1}, 4)
+        self.assertAlmostEqual(actual, 29/110, msg = 'Expected compact hat to give the same exact probability.')
+        actual = prob_calculator.experiment(hat, {"blue":2,"green":1}, 4, 20000)
+        self.assertAlmostEqual(actual, 29/110, delta = 0.02, msg = 'Expected compact hat to work with experiment.')
+        self.assertEqual(hat.total, 11, 'Expected experiment to leave the compact hat unchanged.')
+
+    def test_experiment_adaptive(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        result = prob_calculator.experiment_adaptive(hat, {"blue":2,"green":1}, 4, tolerance=0.01, batch_size=1000, seed=95)
+        lower, upper = result['interval']
+        self.assertLessEqual((upper - lower) / 2, 0.01, 'Expected adaptive experiment to stop once the tolerance is met.')
+        self.assertTrue(lower <= result['probability'] <= upper, 'Expected the estimate to lie in its interval.')
+        self.assertTrue(lower <= 29/110 <= upper, 'Expected the interval to cover the exact probability.')
+        self.assertLess(result['num_experiments'], 20000, 'Expected adaptive experiment to stop early.')
+        result = prob_calculator.experiment_adaptive(hat, {"blue":2,"green":1}, 4, tolerance=1e-6, batch_size=1000, max_experiments=3000, seed=95)
+        self.assertEqual(result['num_experiments'], 3000, 'Expected adaptive experiment to respect max_experiments.')
+        for kwargs in ({'batch_size': 0}, {'max_experiments': 0}):
+            with self.assertRaises(ValueError):
+                prob_calculator.experiment_adaptive(hat, {"blue":2,"green":1}, 4, **kwargs)
+
+    def test_experiment_many(self):
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        specs = [{"blue":2}, {"blue":2,"green":1}, {"red":1}]
+        actual = prob_calculator.experiment_many(hat, specs, 4, 20000, seed=95)
+        expected = [prob_calculator.experiment_batch(hat, spec, 4, 20000, seed=95) for spec in specs]
+        self.assertEqual(actual, expected, 'Expected every query to be scored against the same draws.')
+
+    def test_hat_sample(self):
+        hat = prob_calculator.Hat(red=5,blue=2,green=4)
+        prob_calculator.random.seed(11)
+        actual = hat.sample(6)
+        self.assertEqual(len(hat.contents), 11, 'Expected hat sample to leave the contents unchanged.')
+        prob_calculator.random.seed(11)
+        expected = hat.draw(6)
+        self.assertEqual(actual, expected, 'Expected hat sample to return the same balls as draw.')
+        # Drawing every ball, and both the tree and the copy strategies on a large hat
+        big_hat = prob_calculator.Hat(red=50000,blue=20000,green=40000)
+        for hat, n in [(prob_calculator.Hat(red=5,blue=2,green=4), 11), (big_hat, 5), (big_hat, 50), (big_hat, 5), (big_hat, 1000)]:
+            contents = list(hat.contents)
+            prob_calculator.random.seed(11)
+            actual = hat.sample(n)
+            self.assertEqual(hat.contents, contents, 'Expected hat sample to leave the contents unchanged.')
+            prob_calculator.random.seed(11)
+            expected = copy.deepcopy(hat).draw(n)
+            self.assertEqual(actual, expected, 'Expected hat sample to return the same balls as draw.')
+        for hat in (prob_calculator.Hat(red=0), prob_calculator.Hat(red=2)):
+            hat.draw(len(hat.contents))
+            self.assertEqual(hat.sample(0), [], 'Expected sampling no balls from an empty hat to return nothing.')
+            self.assertEqual(prob_calculator.experiment(hat, {}, 0, 5), 1.0, 'Expected an experiment on an empty hat to run.')
+        hat = prob_calculator.CompactHat(red=5,blue=2,green=4)
+        self.assertEqual(len(hat.sample(6)), 6, 'Expected compact hat sample to return six balls.')
+        self.assertEqual(hat.counts, [5,2,4], 'Expected compact hat sample to leave the counts unchanged.')
+
+    def test_hat_stream(self):
+        hat = prob_calculator.Hat(red=5,blue=2)
+        drawn = list(hat.stream())
+        self.assertEqual(sorted(drawn), ["blue"]*2 + ["red"]*5, 'Expected stream without replacement to yield every ball once.')
+        self.assertEqual(hat.contents, [], 'Expected stream without replacement to empty the hat.')
+        hat = prob_calculator.CompactHat(red=5,blue=2)
+        stream = hat.stream(replace=True)
+        drawn = [next(stream) for i in range(50)]
+        self.assertEqual(set(drawn), {"red","blue"}, 'Expected stream with replacement to keep drawing from every color.')
+        self.assertEqual(hat.total, 7, 'Expected stream with replacement to leave the hat unchanged.')
+
+    def test_hat_draw_counts(self):
+        for cls in (prob_calculator.Hat, prob_calculator.CompactHat):
+            hat = cls(red=5,blue=2,green=3)
+            counts = hat.draw_counts(4)
+            self.assertEqual(sum(counts.values()), 4, 'Expected draw_counts to tally four balls.')
+            self.assertEqual(len(hat.contents), 6, 'Expected draw_counts without replacement to remove the balls.')
+            expected = prob_calculator.Counter(hat.contents)
+            self.assertEqual(hat.draw_counts(10), expected, 'Expected drawing too many balls to tally all the balls.')
+            self.assertEqual(hat.draw_counts(3, replace=True), prob_calculator.Counter(), 'Expected drawing from an empty hat to tally nothing.')
+            hat = cls(red=5,blue=2,green=3)
+            counts = hat.draw_counts(100, replace=True)
+            self.assertEqual(sum(counts.values()), 100, 'Expected draw_counts with replacement to tally every draw.')
+            self.assertEqual(len(hat.contents), 10, 'Expected draw_counts with replacement to leave the hat unchanged.')
+
+    def test_experiment_importance(self):
+        hat = prob_calculator.Hat(red=1000,blue=5,green=5)
+        expected = prob_calculator.exact_probability(hat, {"blue":3,"green":3}, 10)
+        result = prob_calculator.experiment_importance(hat, {"blue":3,"green":3}, 10, 10000, seed=95)
+        self.assertAlmostEqual(result['probability'], expected, delta = 4*result['std_error'], msg = 'Expected importance sampling to estimate a rare probability.')
+        self.assertLess(result['std_error'], 0.1*expected, 'Expected importance sampling to give a low-variance estimate.')
+        hat = prob_calculator.Hat(blue=3,red=2,green=6)
+        result = prob_calculator.experiment_importance(hat, {"blue":2,"green":1}, 4, 20000, weights={}, seed=95)
+        self.assertAlmostEqual(result['probability'], 29/110, delta = 0.01, msg = 'Expected unit weights to reduce to plain simulation.')
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
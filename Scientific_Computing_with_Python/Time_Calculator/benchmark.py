@@ -0,0 +1,73 @@
+# Micro-benchmarks for time_calculator. Run with:
+#
+#     python benchmark.py [--number 100000] [--output results.json]
+#
+# Reports the per-call latency of add_time and add_time_cached for a few representative
+# inputs (best of --repeat timeit runs) and the per-row cost of add_time_batch and
+# add_time_tz_batch. Results are emitted as JSON so that two runs, e.g. before and after a
+# change, can be compared.
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+
+from time_calculator import add_time, add_time_batch, add_time_cached, add_time_tz_batch
+
+CASES = {
+    'same day': ('3:30 PM', '2:12', None),
+    'next day': ('9:15 PM', '5:30', None),
+    'many days': ('8:16 PM', '466:02', None),
+    'with day': ('11:43 PM', '24:20', 'tueSday'),
+}
+
+
+def random_rows(size, seed=0):
+    '''Returns size random (start, duration, starting_day) rows'''
+    rng = random.Random(seed)
+    starts = [f'{rng.randint(1, 11)}:{rng.randint(0, 59):02d} {rng.choice(["AM", "PM"])}' for _ in range(size)]
+    durations = [f'{rng.randint(0, 500)}:{rng.randint(0, 59):02d}' for _ in range(size)]
+    starting_days = [rng.choice(['Monday', 'friday', 'SUNDAY']) for _ in range(size)]
+    return starts, durations, starting_days
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark time_calculator.')
+    parser.add_argument('--number', type=int, default=100000, help='calls per timed run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case')
+    parser.add_argument('--rows', type=int, default=100000, help='rows per add_time_batch call')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, call in CASES.items():
+        best = min(timeit.repeat(lambda: add_time(*call), number=args.number, repeat=args.repeat))
+        results.append({'benchmark': 'add_time', 'case': name, 'ns_per_call': best / args.number * 1e9})
+        best = min(timeit.repeat(lambda: add_time_cached(*call), number=args.number, repeat=args.repeat))
+        results.append({'benchmark': 'add_time_cached', 'case': name, 'ns_per_call': best / args.number * 1e9})
+
+    rows = random_rows(args.rows)
+    best = min(timeit.repeat(lambda: add_time_batch(*rows), number=1, repeat=args.repeat))
+    results.append({'benchmark': 'add_time_batch', 'case': f'{args.rows} random rows', 'ns_per_call': best / args.rows * 1e9})
+
+    # The transition table is built by the first (untimed) call and reused afterwards
+    starts, durations, _ = rows
+    add_time_tz_batch(starts, durations, '2024-03-09', 'America/New_York')
+    best = min(timeit.repeat(lambda: add_time_tz_batch(starts, durations, '2024-03-09', 'America/New_York'), 
+                             number=1, repeat=args.repeat))
+    results.append({'benchmark': 'add_time_tz_batch', 'case': f'{args.rows} random rows', 'ns_per_call': best / args.rows * 1e9})
+
+    for record in results:
+        print(f"{record['benchmark']:>17} {record['case']:<20} {record['ns_per_call']:>10,.0f} ns/call", file=sys.stderr)
+
+    report = {'python': platform.python_version(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
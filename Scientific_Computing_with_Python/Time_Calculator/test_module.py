@@ -1,5 +1,7 @@
+import datetime
 import unittest
-from time_calculator import add_time
+from time_calculator import (ClockTime, add_time, add_time_batch, add_time_cache_clear, add_time_cache_info,
+                             add_time_cached, add_time_tz, add_time_tz_batch)
 
 
 class UnitTests(unittest.TestCase):
@@ -64,5 +66,72 @@ class UnitTests(unittest.TestCase):
         expected = "6:18 AM, Monday (20 days later)"
         self.assertEqual(actual, expected, 'Expected calling "add_time()" with "8:16 PM", "466:02", "tuesday" to return "6:18 AM, Monday (20 days later)"')
 
+    def test_batch(self):
+        starts = ["3:30 PM", "11:55 AM", "9:15 PM", "11:40 AM", "2:59 AM", "11:59 PM", "8:16 PM", "5:01 AM", "3:30 PM", "8:16 PM"]
+        durations = ["2:12", "3:12", "5:30", "0:25", "24:00", "24:05", "466:02", "0:00", "2:12", "466:02"]
+        actual = add_time_batch(starts, durations)
+        expected = [add_time(start, duration) for start, duration in zip(starts, durations)]
+        self.assertEqual(actual, expected, 'Expected "add_time_batch()" to match "add_time()" row by row')
+        starting_days = ["Monday", "saturDay", "Wednesday", "tuesday"] * 2 + ["Sunday", "friday"]
+        actual = add_time_batch(starts, durations, starting_days)
+        expected = [add_time(start, duration, day) for start, duration, day in zip(starts, durations, starting_days)]
+        self.assertEqual(actual, expected, 'Expected "add_time_batch()" with starting days to match "add_time()" row by row')
+
+    def test_batch_single_day_and_error(self):
+        actual = add_time_batch(["11:43 PM", "3:75 PM"], ["24:20", "1:00"], "tueSday")
+        expected = ["12:03 AM, Thursday (2 days later)", "Error: The start/duration is in an incorrect format"]
+        self.assertEqual(actual, expected, 'Expected "add_time_batch()" to apply one starting day to every row and flag format errors')
+
+    def test_unknown_day(self):
+        for call in (lambda: add_time("3:00 PM", "3:10", "Funday"), lambda: add_time_batch(["3:00 PM"], ["3:10"], "Funday"), 
+                     lambda: ClockTime.parse("3:00 PM", "Funday"), lambda: add_time_cached("3:00 PM", "3:10", "Funday")):
+            with self.assertRaises(ValueError):
+                call()
+
+    def test_batch_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            add_time_batch(["3:00 PM", "4:00 PM", "5:00 PM"], ["1:00"])
+        with self.assertRaises(ValueError):
+            add_time_batch(["3:00 PM", "4:00 PM"], ["1:00", "2:00"], ["Monday"])
+
+    def test_clock_time_chain(self):
+        start = ClockTime.parse("8:16 PM", "tuesday")
+        end = start + "200:00" + "266:02"
+        self.assertEqual(end.format(since=start, with_day=True), add_time("8:16 PM", "466:02", "tuesday"), 'Expected chained ClockTime additions to match "add_time()"')
+        self.assertEqual(end - start, 466*60 + 2, 'Expected the difference of two ClockTimes in minutes')
+        self.assertEqual(start + 90, ClockTime.parse("9:46 PM", "Tuesday"), 'Expected integer durations to be added as minutes')
+        self.assertTrue(start <= start < end and end >= start > ClockTime(0), 'Expected ClockTimes to be ordered by their minutes')
+        self.assertEqual(str(ClockTime.parse("11:59 PM", "Sunday") + "0:01"), "12:00 AM, Monday", 'Expected the week to roll over after Sunday')
+        with self.assertRaises(AttributeError):
+            start.minutes = 0
+        with self.assertRaises(ValueError):
+            start + "1:75"
+
+    def test_cached(self):
+        add_time_cache_clear()
+        cases = [("11:43 PM", "24:20", "tueSday"), ("8:16 PM", "466:02", None),
+                 ("8:16 PM", "298:02", None), ("11:59 PM", "24:05", "Wednesday"), ("3:30 PM", "2:60", None)]
+        for case in cases:
+            self.assertEqual(add_time_cached(*case), add_time(*case), 'Expected add_time_cached to return the same result as add_time.')
+        # 466:02 and 298:02 differ by exactly one week, so they share a cached result
+        self.assertEqual(add_time_cache_info()['results'].hits, 1, 'Expected durations a whole number of weeks apart to share a cache entry.')
+        add_time_cache_clear()
+        self.assertEqual(add_time_cache_info()['results'].currsize, 0, 'Expected add_time_cache_clear to empty the cache.')
+
+    def test_time_zone(self):
+        actual = add_time_tz("1:30 AM", "1:00", "2024-03-10", "America/New_York")
+        self.assertEqual(actual, "3:30 AM, Sunday", 'Expected the clocks going forward to skip an hour.')
+        actual = add_time_tz("1:30 AM", "1:00", "2024-11-03", "America/New_York")
+        self.assertEqual(actual, "1:30 AM, Sunday", 'Expected the clocks going back to repeat an hour.')
+        actual = add_time_tz("11:43 PM", "24:20", datetime.date(2024, 1, 2), "UTC")
+        self.assertEqual(actual, add_time("11:43 PM", "24:20", "Tuesday"), 'Expected UTC to match add_time.')
+
+    def test_time_zone_batch(self):
+        actual = add_time_tz_batch(["10:00 PM", "10:00 PM", "3:60 PM"], ["30:00", "30:00", "1:00"], 
+                                   ["2024-03-30", "2024-10-26", "2024-10-26"], "Europe/Paris")
+        expected = ["5:00 AM, Monday (2 days later)", "3:00 AM, Monday (2 days later)", 
+                    "Error: The start/duration is in an incorrect format"]
+        self.assertEqual(actual, expected, 'Expected add_time_tz_batch to apply the daylight saving changes of the zone.')
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
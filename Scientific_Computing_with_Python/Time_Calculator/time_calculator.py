@@ -1,14 +1,38 @@
 import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache, total_ordering
+from zoneinfo import ZoneInfo
+
+import numpy as np
 
 
 days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'] 
 
+# {'monday': 0, ..., 'sunday': 6}
+day_index = {day.lower(): i for i, day in enumerate(days)}
+
+# Compiled once, e.g. "3:30 PM" and "205:12"
+rgx_start = re.compile(r'(\d+):(\d+)\s([A|P]M)')
+rgx_duration = re.compile(r'(\d+):(\d+)')
+
 # {'0AM': 0, ..., '12PM':12, ..., '11PM':23}
 military_map = {f'{i}AM' if i in range(0,12) else f'{i%12}PM' if i != 12 else '12PM':i for i in range(0,24)}
 
 # {0:0, ..., 12:12, 13:1, ..., 23:11}
 am_pm_map = {i : i%12 if i != 12 and i != 0 else 12 for i in range(0,24)}
 
+FORMAT_ERROR = 'Error: The start/duration is in an incorrect format'
+
+MINUTES_PER_WEEK = 7*24*60
+
+# Local and UTC seconds are counted from 1970-01-01, a Thursday
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+SECONDS_PER_DAY = 24*60*60
+
+# Bounds of the add_time_cached caches: results, and parsed start/duration strings
+RESULT_CACHE_SIZE = 2**16
+PARSE_CACHE_SIZE = 2**12
+
 
 def hoursMap(hrs):
     '''Maps hours from AM/PM' to military time'''
@@ -32,6 +56,36 @@ def calcHrMin(st_hrs, dur_hrs, st_min, dur_min, sgn):
         
     return total_hours, total_min
 
+def dayIndex(day):
+    '''Returns the index in days of a day name (case insensitive), or raises ValueError'''
+    try:
+        return day_index[day.lower()]
+    except KeyError:
+        raise ValueError(f'{day!r} is not a day of the week') from None
+
+def parseStart(start):
+    '''Parses a start time such as "3:30 PM" into its hour string, minutes and AM/PM'''
+    hr_start, min_start, sign = rgx_start.search(start).groups()
+    return hr_start, int(min_start), sign
+
+def parseDuration(duration):
+    '''Parses a duration such as "205:12" into its hours and minutes'''
+    hr_dur, min_dur = rgx_duration.search(duration).groups()
+    return int(hr_dur), int(min_dur)
+
+def formatClock(total_hours, total_min):
+    '''Formats a time of day, e.g. (15, 7) -> "3:07 PM". Hours past 23 wrap around.'''
+    new_hrs = invMap(total_hours % 24) 
+    new_sign = 'AM' if total_hours % 24 < 12 else 'PM'    
+    return f"{new_hrs}:{'' if total_min > 9 else 0}{total_min} {new_sign}"
+
+# ['12:00 AM', '12:01 AM', ..., '11:59 PM'], indexed by minute of the day
+clock_faces = np.array([formatClock(m // 60, m % 60) for m in range(24*60)], dtype=object)
+
+def formatLater(n):
+    '''Formats how many days later a time is, e.g. 2 -> " (2 days later)"'''
+    return '' if n==0 else ' (next day)' if n==1 else f' ({n} days later)'
+
 def add_time(start, duration, starting_day=None):
     '''
     Args:
@@ -77,31 +131,445 @@ def add_time(start, duration, starting_day=None):
             7:42 AM (9 days later)
     '''      
     # Parse the input information
-    rgx_start, rgx_duration = r'(\d+):(\d+)\s([A|P]M)', r'(\d+):(\d+)'
-    parsed_start, parsed_duration = re.findall(rgx_start, start), re.findall(rgx_duration, duration)
-    
-    # Extract the parsed information
-    hr_start, min_start, sign = parsed_start[0][0], int(parsed_start[0][1]), parsed_start[0][2]
-    hr_dur, min_dur =  int(parsed_duration[0][0]), int(parsed_duration[0][1])
+    hr_start, min_start, sign = parseStart(start)
+    hr_dur, min_dur = parseDuration(duration)
         
     # Check for formatting error
     if min_start > 59 or min_dur > 59:
-        return 'Error: The start/duration is in an incorrect format'
+        return FORMAT_ERROR
     
     total_hours, total_min = calcHrMin(hr_start, hr_dur, min_start, min_dur, sign) 
         
     # Calculate how many days have passed
     n = total_hours // 24
     
-    new_hrs = invMap(total_hours % 24) 
-    new_sign = 'AM' if total_hours % 24 < 12 else 'PM'    
-    new_time = f"{new_hrs}:{'' if total_min > 9 else 0}{total_min} {new_sign}"
+    new_time = formatClock(total_hours, total_min)
     
     calc_day = ''
     if starting_day != None:
-        temp = [*map(lambda x: x.lower(), days)] # lowercase days of the week
-        idx = temp.index(starting_day.lower()) + n
+        idx = dayIndex(starting_day) + n
         calc_day = f', {days[idx%7]}'
-    return f"{new_time}{calc_day}{'' if n==0 else ' (next day)' if n==1 else f' ({n} days later)'}" 
+    return f"{new_time}{calc_day}{formatLater(n)}" 
+
+def factorize(values):
+    '''
+    Returns:
+        uniques (list): the distinct values, in order of first appearance
+        
+        codes (np.ndarray): the index in uniques of every value
+    '''
+    table = {}
+    codes = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int64)
+    return list(table), codes
+
+def parseColumns(starts, durations):
+    '''
+    Args:
+        starts (list[str]): start times in the 12-hour clock format (ending in AM or PM)
+        
+        durations (list[str]): durations, one per start time
+    
+    Returns:
+        start_minute (np.ndarray): the minute of the day of every start time
+        
+        duration_minutes (np.ndarray): the length of every duration in minutes
+        
+        valid (np.ndarray): False for the rows add_time reports as a format error
+    '''
+    if len(starts) != len(durations):
+        raise ValueError(f'Expected one duration per start time, got {len(durations)} durations '
+                         f'for {len(starts)} start times')
+        
+    # Parse each distinct start and duration once
+    unique_starts, start_idx = factorize(starts)
+    unique_durations, duration_idx = factorize(durations)
+    parsed_starts = [parseStart(s) for s in unique_starts]
+    parsed_durations = np.array([parseDuration(d) for d in unique_durations], dtype=np.int64).reshape(-1, 2)
+    
+    min_start = np.array([m for _, m, _ in parsed_starts], dtype=np.int64)[start_idx]
+    hr_dur, min_dur = parsed_durations[duration_idx, 0], parsed_durations[duration_idx, 1]
+    valid = (min_start <= 59) & (min_dur <= 59)
+    
+    # Map the hours of the starts used by valid rows to 0-23 (as add_time does)
+    used = np.zeros(len(unique_starts), dtype=bool)
+    used[start_idx[valid]] = True
+    hr_start = np.array([hoursMap(h + sign) if u else 0 for (h, _, sign), u in zip(parsed_starts, used)], 
+                        dtype=np.int64)[start_idx]
+    
+    return hr_start*60 + min_start, hr_dur*60 + min_dur, valid
+
+def add_time_batch(starts, durations, starting_days=None):
+    '''
+    Args:
+        starts (list[str]): start times in the 12-hour clock format (ending in AM or PM)
+        
+        durations (list[str]): durations, one per start time
+        
+        starting_days (list[str], str or None): (optional) a starting day of the week per 
+                                                start time, or one day for all of them
+    
+    Returns:
+        (list[str]): add_time(start, duration, starting_day) for every row
+    
+    Notes:
+        - The output matches the scalar add_time exactly, row by row, including the error 
+          message for out of range minutes.
+          
+        - Each distinct start, duration and day name is parsed once, then the columns are 
+          converted to integer minutes and the day/hour arithmetic is done with NumPy. The 
+          results are assembled from tables of preformatted clock times, day names and 
+          "days later" suffixes.
+          
+        - Example:
+        
+            >> add_time_batch(["3:00 PM", "11:43 PM"], ["3:10", "24:20"], "tueSday")
+            ['6:10 PM, Tuesday', '12:03 AM, Thursday (2 days later)']
+    '''
+    start_minute, duration_minutes, valid = parseColumns(starts, durations)
+    total = start_minute + duration_minutes
+    n, minute_of_day = np.divmod(total, 24*60)
+    
+    unique_n, n_idx = np.unique(n, return_inverse=True)
+    later = np.array([formatLater(int(k)) for k in unique_n], dtype=object)[n_idx]
+    result = clock_faces[minute_of_day]
+    
+    if starting_days is not None:
+        if isinstance(starting_days, str):
+            unique_days, day_idx = [starting_days], np.zeros(len(total), dtype=np.int64)
+        elif len(starting_days) != len(total):
+            raise ValueError(f'Expected one starting day per start time, got {len(starting_days)} '
+                             f'starting days for {len(total)} start times')
+        else:
+            unique_days, day_idx = factorize(starting_days)
+        # Like add_time, only raise for an unknown day on a row that is not a format error
+        used = np.zeros(len(unique_days), dtype=bool)
+        used[day_idx[valid]] = True
+        day_idx = np.array([dayIndex(d) if u else 0 for d, u in zip(unique_days, used)], 
+                           dtype=np.int64)[day_idx]
+        names = np.array([f', {d}' for d in days], dtype=object)
+        result = result + names[(day_idx + n) % 7]
+        
+    result = result + later
+    result[~valid] = FORMAT_ERROR
+    return result.tolist()
+
+@total_ordering
+class ClockTime:
+    '''
+    An immutable time of the week, stored as a single integer: the number of minutes since 
+    Monday 12:00 AM of the first week. Durations are added as integer minutes, so a chain of 
+    additions (e.g. building an itinerary) parses and formats strings only at its ends. 
+    ClockTimes are hashable and support all the comparison operators.
+    
+    Example:
+        >> leg = ClockTime.parse("11:43 PM", "tueSday") + "24:20"
+        >> leg.minutes
+        4323
+        >> (leg + "0:30").format(since=leg, with_day=True)
+        12:33 AM, Thursday
+        >> str(leg)
+        12:03 AM, Thursday
+    '''
+    __slots__ = ('minutes',)
+    
+    def __init__(self, minutes):
+        object.__setattr__(self, 'minutes', minutes)
+        
+    def __setattr__(self, name, value):
+        raise AttributeError('ClockTime is immutable')
+        
+    def __delattr__(self, name):
+        raise AttributeError('ClockTime is immutable')
+    
+    @classmethod
+    def parse(cls, start, starting_day=None):
+        '''
+        Args:
+            start (str): a time in the 12-hour clock format (ending in AM or PM)
+            
+            starting_day (str or None): (optional) the day of the week, case insensitive. 
+                                        Monday by default.
+        '''
+        hr_start, min_start, sign = parseStart(start)
+        if min_start > 59:
+            raise ValueError(FORMAT_ERROR)
+        day = 0 if starting_day is None else dayIndex(starting_day)
+        return cls(day*24*60 + hoursMap(hr_start + sign)*60 + min_start)
+    
+    def __add__(self, duration):
+        '''Adds a duration, given as minutes (int) or as a "hours:minutes" string'''
+        if isinstance(duration, str):
+            hr_dur, min_dur = parseDuration(duration)
+            if min_dur > 59:
+                raise ValueError(FORMAT_ERROR)
+            duration = hr_dur*60 + min_dur
+        elif not isinstance(duration, int):
+            return NotImplemented
+        return ClockTime(self.minutes + duration)
+    
+    def __sub__(self, other):
+        '''Returns the number of minutes between two times'''
+        if not isinstance(other, ClockTime):
+            return NotImplemented
+        return self.minutes - other.minutes
+    
+    def __eq__(self, other):
+        return isinstance(other, ClockTime) and self.minutes == other.minutes
+    
+    def __lt__(self, other):
+        if not isinstance(other, ClockTime):
+            return NotImplemented
+        return self.minutes < other.minutes
+    
+    def __hash__(self):
+        return hash(self.minutes)
+    
+    @property
+    def day(self):
+        '''The number of days since Monday of the first week'''
+        return self.minutes // (24*60)
+    
+    @property
+    def weekday(self):
+        '''The name of the day of the week, e.g. "Thursday"'''
+        return days[self.day % 7]
+    
+    def format(self, since=None, with_day=False):
+        '''
+        Args:
+            since (ClockTime or None): (optional) show how many days later than this time it is
+            
+            with_day (bool): show the day of the week
+            
+        Returns:
+            (str): the time in the same format as add_time, e.g. "12:03 AM, Thursday (2 days later)"
+        '''
+        calc_day = f', {self.weekday}' if with_day else ''
+        later = formatLater(self.day - since.day) if since is not None else ''
+        return f"{clock_faces[self.minutes % (24*60)]}{calc_day}{later}"
+    
+    def __str__(self):
+        return self.format(with_day=True)
+    
+    def __repr__(self):
+        return f'ClockTime({self.minutes})'
+
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def cachedResult(start_minute, duration_minutes, weekday):
+    '''
+    Args:
+        start_minute (int): the start time as a minute of the day (0-1439)
+        
+        duration_minutes (int): the duration in minutes, less than a week
+        
+        weekday (int or None): the index of the starting day in days, if any
+        
+    Returns:
+        (str): the time and day of the week of the result
+        
+        (int): the number of days later
+    '''
+    n, minute_of_day = divmod(start_minute + duration_minutes, 24*60)
+    calc_day = '' if weekday is None else f', {days[(weekday + n) % 7]}'
+    return f'{clock_faces[minute_of_day]}{calc_day}', n
+
+cachedStart = lru_cache(maxsize=PARSE_CACHE_SIZE)(parseStart)
+cachedDuration = lru_cache(maxsize=PARSE_CACHE_SIZE)(parseDuration)
+
+def add_time_cached(start, duration, starting_day=None):
+    '''
+    Same arguments and result as add_time, behind bounded LRU caches.
+    
+    Notes:
+        - Results are cached on the normalized (start minute of the day, duration minutes 
+          modulo a week, weekday) triple, and the whole weeks of the duration are added back 
+          to the day count afterwards. There are only 1440 start minutes and 7 weekdays, so 
+          workloads that repeat a bounded set of durations are served from the cache. 
+          
+        - The parsed start and duration strings are cached too, so a repeated call costs a 
+          few dict lookups.
+          
+        - See add_time_cache_info() for hit/miss statistics.
+    '''
+    hr_start, min_start, sign = cachedStart(start)
+    hr_dur, min_dur = cachedDuration(duration)
+    if min_start > 59 or min_dur > 59:
+        return FORMAT_ERROR
+    
+    weeks, duration_minutes = divmod(hr_dur*60 + min_dur, MINUTES_PER_WEEK)
+    weekday = None if starting_day is None else dayIndex(starting_day)
+    new_time, n = cachedResult(hoursMap(hr_start + sign)*60 + min_start, duration_minutes, weekday)
+    return f"{new_time}{formatLater(n + 7*weeks)}"
+
+def add_time_cache_info():
+    '''
+    Returns:
+        (dict): the hit/miss statistics (functools CacheInfo) of the add_time_cached caches
+        
+            {'results': ..., 'starts': ..., 'durations': ...}
+    '''
+    return {'results': cachedResult.cache_info(), 
+            'starts': cachedStart.cache_info(), 
+            'durations': cachedDuration.cache_info()}
+
+def add_time_cache_clear():
+    '''Empties the add_time_cached caches and resets their statistics'''
+    for cache in (cachedResult, cachedStart, cachedDuration):
+        cache.cache_clear()
+
+def utcOffset(tz, utc_seconds):
+    '''Returns the UTC offset, in seconds, of the zone tz at an instant given in UTC seconds'''
+    instant = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=utc_seconds)
+    return int(instant.astimezone(tz).utcoffset().total_seconds())
+
+@lru_cache(maxsize=1024)
+def yearTransitions(zone, year):
+    '''
+    Args:
+        zone (str): an IANA time zone name, e.g. "America/New_York"
+        
+        year (int): a calendar year
+    
+    Returns:
+        (list[tuple[int, int]]): (UTC seconds, UTC offset in seconds) of the offset in effect 
+                                 at the start of the year (UTC), then of every change of the 
+                                 offset during the year
+    
+    Notes:
+        - zoneinfo does not expose its transitions, so the offset is sampled once a day and 
+          every change is located to the second by bisection. Two changes within one day (not 
+          used by any zone since 1970) would be missed.
+    '''
+    tz = ZoneInfo(zone)
+    first = (date(year, 1, 1).toordinal() - EPOCH_ORDINAL)*SECONDS_PER_DAY
+    last = (date(year + 1, 1, 1).toordinal() - EPOCH_ORDINAL)*SECONDS_PER_DAY if year < 9999 else first + 365*SECONDS_PER_DAY
+    
+    transitions = [(first, utcOffset(tz, first))]
+    for day_start in range(first, last, SECONDS_PER_DAY):
+        day_end = min(day_start + SECONDS_PER_DAY, last)
+        offset = utcOffset(tz, day_end)
+        if offset == transitions[-1][1]:
+            continue
+        # The offset is transitions[-1][1] at lo and offset at hi
+        lo, hi = day_start, day_end
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if utcOffset(tz, mid) == offset:
+                hi = mid
+            else:
+                lo = mid
+        transitions.append((hi, offset))
+    return transitions
+
+@lru_cache(maxsize=64)
+def transitionTable(zone, first_year, last_year):
+    '''
+    Returns:
+        utc_starts (np.ndarray): the UTC seconds from which each offset applies
+        
+        offsets (np.ndarray): the UTC offsets in seconds
+        
+        local_starts (np.ndarray): the local seconds from which each offset applies to wall 
+                                   clock times (see add_time_tz)
+    
+    Notes:
+        - Covers first_year to last_year (inclusive), and is built from the cached 
+          yearTransitions of each year, so the zone database is only queried for new years.
+    '''
+    utc_starts, offsets = [], []
+    for year in range(first_year, last_year + 1):
+        for utc_start, offset in yearTransitions(zone, year):
+            if not offsets or offset != offsets[-1]:
+                utc_starts.append(utc_start)
+                offsets.append(offset)
+    utc_starts, offsets = np.array(utc_starts, dtype=np.int64), np.array(offsets, dtype=np.int64)
+    
+    # A wall clock time keeps the earlier offset until the later of the two local readings of a 
+    # change: times skipped by a gap, and the first of two repeated times, use the earlier offset
+    local_starts = utc_starts.copy()
+    local_starts[1:] += np.maximum(offsets[:-1], offsets[1:])
+    local_starts[0] = np.iinfo(np.int64).min
+    return utc_starts, offsets, local_starts
+
+def toOrdinal(day):
+    '''Returns the proleptic Gregorian ordinal of a date or of an ISO "YYYY-MM-DD" string'''
+    return (day if isinstance(day, date) else date.fromisoformat(day)).toordinal()
+
+def add_time_tz_batch(starts, durations, dates, zone):
+    '''
+    Args:
+        starts (list[str]): wall clock start times in the 12-hour clock format (ending in AM or PM)
+        
+        durations (list[str]): elapsed durations, one per start time
+        
+        dates (list[date or str], date or str): the calendar date of every start time, or one 
+                                                date for all of them (datetime.date or ISO string)
+        
+        zone (str): an IANA time zone name, e.g. "Europe/Paris"
+    
+    Returns:
+        (list[str]): the wall clock time in zone after each duration, in the format of add_time 
+                     with the day of the week of the resulting date
+    
+    Notes:
+        - The durations are elapsed time: across a daylight saving change the wall clock moves 
+          by an hour more or less than the duration.
+        
+        - Start times that do not exist (skipped by a gap) or are repeated (when the clocks go 
+          back) are read with the offset in effect before the change, like datetime with fold=0.
+          
+        - The offsets come from zoneinfo (the system tzdata, or the tzdata package). The 
+          transitions of each zone and year are computed once and cached, and every row is then 
+          converted with a binary search over the transition table.
+          
+        - Example:
+        
+            >> add_time_tz_batch(["1:30 AM", "1:30 AM"], ["1:00", "1:00"], 
+                                 ["2024-03-10", "2024-11-03"], "America/New_York")
+            ['3:30 AM, Sunday', '1:30 AM, Sunday']
+    '''
+    start_minute, duration_minutes, valid = parseColumns(starts, durations)
+    if isinstance(dates, (date, str)):
+        ordinal = np.full(len(start_minute), toOrdinal(dates), dtype=np.int64)
+    elif len(dates) != len(start_minute):
+        raise ValueError(f'Expected one date per start time, got {len(dates)} dates for '
+                         f'{len(start_minute)} start times')
+    else:
+        unique_dates, date_idx = factorize(dates)
+        ordinal = np.array([toOrdinal(d) for d in unique_dates], dtype=np.int64)[date_idx]
+    
+    result = np.full(len(start_minute), FORMAT_ERROR, dtype=object)
+    if not valid.any():
+        return result.tolist()
+    start_minute, duration_minutes, ordinal = start_minute[valid], duration_minutes[valid], ordinal[valid]
+    
+    # Local seconds of the starts, and the years the table must cover (the day before the 
+    # first start, for zones ahead of UTC, to two days after the last result)
+    local = (ordinal - EPOCH_ORDINAL)*SECONDS_PER_DAY + start_minute*60
+    last_ordinal = int((ordinal + (start_minute + duration_minutes) // (24*60)).max()) + 2
+    first_year = date.fromordinal(int(ordinal.min()) - 1).year
+    utc_starts, offsets, local_starts = transitionTable(zone, first_year, date.fromordinal(last_ordinal).year)
+    
+    utc = local - offsets[np.searchsorted(local_starts, local, side='right') - 1] + duration_minutes*60
+    new_local = utc + offsets[np.searchsorted(utc_starts, utc, side='right') - 1]
+    
+    new_day, seconds = np.divmod(new_local, SECONDS_PER_DAY)
+    n = new_day - local // SECONDS_PER_DAY
+    names = np.array([f', {d}' for d in days], dtype=object)
+    unique_n, n_idx = np.unique(n, return_inverse=True)
+    later = np.array([formatLater(int(k)) for k in unique_n], dtype=object)[n_idx]
+    
+    result[valid] = clock_faces[seconds // 60] + names[(new_day + EPOCH_ORDINAL - 1) % 7] + later
+    return result.tolist()
+
+def add_time_tz(start, duration, day, zone):
+    '''
+    Same as add_time_tz_batch, for a single start time on the date day (datetime.date or ISO 
+    string) in the IANA zone, e.g. 
+    
+        >> add_time_tz("1:30 AM", "1:00", "2024-03-10", "America/New_York")
+        3:30 AM, Sunday
+    '''
+    return add_time_tz_batch([start], [duration], day, zone)[0]
 
 add_time("6:30 PM", "205:12")
\ No newline at end of file